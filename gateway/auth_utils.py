@@ -0,0 +1,127 @@
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+
+# Cùng khóa/thuật toán với auth-service
+AUTH_SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "super_secret_key_123")
+AUTH_ALGORITHM = os.getenv("AUTH_ALGORITHM", "HS256")
+
+# Bí mật chung giữa gateway và các service: service chỉ tin header X-User-* khi header này khớp
+GATEWAY_SHARED_SECRET = os.getenv("GATEWAY_SHARED_SECRET", "")
+
+TOKEN_CACHE_SIZE = int(os.getenv("GATEWAY_TOKEN_CACHE_SIZE", "10000"))
+# Token không có "exp" chỉ được giữ trong cache tối đa chừng này giây
+TOKEN_CACHE_FALLBACK_TTL = 300
+
+GATEWAY_SECRET_HEADER = "x-gateway-secret"
+# Bí mật riêng giữa các service (SERVICE_SHARED_SECRET); gateway không biết và không bao giờ chuyển tiếp
+SERVICE_SECRET_HEADER = "x-service-secret"
+# Header claim -> tên claim trong JWT
+CLAIM_HEADERS = {
+    "x-user-id": "user_id",
+    "x-user-role": "role",
+    "x-user-email": "sub",
+}
+TRUSTED_HEADERS = set(CLAIM_HEADERS) | {GATEWAY_SECRET_HEADER, SERVICE_SECRET_HEADER}
+
+
+def _bearer_token(headers) -> Optional[str]:
+    authorization = headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    return authorization.split(" ", 1)[1].strip() or None
+
+
+class TokenVerifier:
+    """
+    Xác thực JWT một lần tại gateway. Token đã xác thực được giữ trong LRU
+    (key là sha256 của token, không lưu token gốc) cho tới khi hết hạn.
+    """
+
+    def __init__(self, secret_key: str, algorithm: str, max_entries: int = TOKEN_CACHE_SIZE):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Trả về claims nếu token hợp lệ, None nếu sai chữ ký/hết hạn."""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if expires_at > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return claims
+            del self.entries[key]
+        self.misses += 1
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            self.failures += 1
+            return None
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            expires_at = now + TOKEN_CACHE_FALLBACK_TTL
+        self.entries[key] = (claims, float(expires_at))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return claims
+
+    def identity_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """
+        Bỏ các header X-User-*/X-Gateway-Secret/X-Service-Secret do client tự gửi, rồi gắn claims của
+        token đã xác thực. Token không hợp lệ thì không gắn gì, service tự xử lý như cũ.
+        """
+        result = {k: v for k, v in headers.items() if k.lower() not in TRUSTED_HEADERS}
+        token = _bearer_token(headers)
+        if token is None:
+            return result
+        claims = self.verify(token)
+        if claims is None:
+            return result
+        for header, claim in CLAIM_HEADERS.items():
+            if claims.get(claim) is not None:
+                result[header] = str(claims[claim])
+        if GATEWAY_SHARED_SECRET:
+            result[GATEWAY_SECRET_HEADER] = GATEWAY_SHARED_SECRET
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
+
+
+token_verifier = TokenVerifier(AUTH_SECRET_KEY, AUTH_ALGORITHM)
+
+
+def require_admin(request: Request):
+    """
+    Dependency cho các route quản trị/thống kê /_gateway/*: chỉ cho phép JWT role admin
+    hoặc lời gọi nội bộ mang X-Gateway-Secret khớp GATEWAY_SHARED_SECRET.
+    """
+    secret = request.headers.get(GATEWAY_SECRET_HEADER)
+    if GATEWAY_SHARED_SECRET and secret and hmac.compare_digest(secret, GATEWAY_SHARED_SECRET):
+        return
+    token = _bearer_token(request.headers)
+    claims = token_verifier.verify(token) if token else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    if claims.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
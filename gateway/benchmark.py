@@ -0,0 +1,265 @@
+"""
+Đo chi phí của chính gateway: chạy gateway (uvicorn) trước một upstream giả lập,
+so sánh với gọi thẳng upstream, ghi kết quả p50/p99/RPS ra file JSON.
+
+    cd gateway
+    python benchmark.py --concurrency 1,10,50 --requests 500 --output bench-before.json
+    # ... sửa proxy ...
+    python benchmark.py --output bench-after.json --compare bench-before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.staticfiles import StaticFiles
+
+GATEWAY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Thư mục chứa file tĩnh của upstream giả lập (do main() tạo)
+BENCH_STATIC_DIR = os.getenv("BENCH_STATIC_DIR")
+LARGE_JSON_ITEMS = 2000
+
+# Upstream giả lập mà mọi service của gateway trỏ tới khi benchmark
+stub_app = FastAPI(title="Gateway benchmark upstream")
+
+_LARGE_PAYLOAD = [
+    {
+        "id": i,
+        "title": f"Opportunity {i}",
+        "description": "Nghiên cứu và phát triển hệ thống gợi ý học bổng " * 4,
+        "criteria": {"gpa_min": 3.0, "skills": ["python", "machine learning", "sql"]},
+    }
+    for i in range(LARGE_JSON_ITEMS)
+]
+
+
+@stub_app.get("/")
+def stub_root():
+    return {"service": "benchmark-stub", "status": "ok"}
+
+
+@stub_app.get("/bench/small")
+def stub_small():
+    return {"id": 1, "status": "ok"}
+
+
+@stub_app.get("/bench/large")
+def stub_large():
+    return _LARGE_PAYLOAD
+
+
+@stub_app.post("/files/upload")
+async def stub_upload(request: Request):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+    return {"received": received}
+
+
+if BENCH_STATIC_DIR:
+    stub_app.mount("/static", StaticFiles(directory=BENCH_STATIC_DIR), name="static")
+
+
+# Kịch bản: (tên, method, path qua gateway, path gọi thẳng upstream, header, kích thước body)
+SCENARIOS = {
+    "small_json": ("GET", "/matching/bench/small", "/bench/small", {}, 0),
+    "large_json": ("GET", "/matching/bench/large", "/bench/large", {"accept-encoding": "identity"}, 0),
+    "large_json_gzip": ("GET", "/matching/bench/large", "/bench/large", {"accept-encoding": "gzip"}, 0),
+    "upload": ("POST", "/storage/files/upload", "/files/upload", {"content-type": "application/octet-stream"}, 1024 * 1024),
+    "static": ("GET", "/static/bench.bin", "/static/bench.bin", {}, 0),
+}
+STATIC_FILE_BYTES = 2 * 1024 * 1024
+UPSTREAM_NAMES = [
+    "auth", "application", "matching", "notification", "opportunity",
+    "provider_app", "user", "storage", "static",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def run_load(base_url: str, method: str, path: str, headers: dict, body: Optional[bytes],
+                   concurrency: int, total: int, warmup: int) -> dict:
+    """Chạy total request với concurrency worker, trả về độ trễ (ms) và RPS."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for _ in range(warmup):
+            await client.request(method, path, headers=headers, content=body)
+
+        latencies: List[float] = []
+        errors = 0
+        remaining = [total]
+
+        async def worker():
+            nonlocal errors
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                # Query khác nhau cho mỗi GET để gateway không gộp/cache, đo đúng chi phí proxy
+                params = {"n": remaining[0]} if method == "GET" else None
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params, headers=headers, content=body)
+                    await response.aread()
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(max(latencies), 3) if latencies else 0.0,
+    }
+
+
+def start_server(app_path: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning"],
+        cwd=GATEWAY_DIR,
+        env={**os.environ, **env},
+    )
+
+
+async def wait_ready(url: str, timeout: float = 20):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} không sẵn sàng sau {timeout}s")
+
+
+async def run_benchmarks(args, gateway_url: str, upstream_url: str) -> List[dict]:
+    results = []
+    upload_body = os.urandom(SCENARIOS["upload"][4])
+    for name in args.scenarios:
+        method, gateway_path, direct_path, headers, body_size = SCENARIOS[name]
+        body = upload_body if body_size else None
+        for concurrency in args.concurrency:
+            row = {"scenario": name, "concurrency": concurrency}
+            for target, base_url, path in (("direct", upstream_url, direct_path),
+                                           ("gateway", gateway_url, gateway_path)):
+                row[target] = await run_load(
+                    base_url, method, path, headers, body, concurrency, args.requests, args.warmup
+                )
+            # Chi phí gateway thêm vào so với gọi thẳng upstream
+            row["overhead_p50_ms"] = round(row["gateway"]["p50_ms"] - row["direct"]["p50_ms"], 3)
+            row["overhead_p99_ms"] = round(row["gateway"]["p99_ms"] - row["direct"]["p99_ms"], 3)
+            print(
+                f"{name:16} c={concurrency:<4} direct p50={row['direct']['p50_ms']:.2f}ms "
+                f"gateway p50={row['gateway']['p50_ms']:.2f}ms p99={row['gateway']['p99_ms']:.2f}ms "
+                f"rps={row['gateway']['rps']}"
+            )
+            results.append(row)
+    return results
+
+
+def print_comparison(current: List[dict], baseline_path: str):
+    """In chênh lệch p50/p99/RPS của gateway so với một report trước đó."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(row["scenario"], row["concurrency"]): row for row in json.load(f)["results"]}
+    print(f"\nSo với {baseline_path}:")
+    for row in current:
+        old = baseline.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        new_gw, old_gw = row["gateway"], old["gateway"]
+        print(
+            f"{row['scenario']:16} c={row['concurrency']:<4} "
+            f"p50 {old_gw['p50_ms']:.2f} -> {new_gw['p50_ms']:.2f}ms  "
+            f"p99 {old_gw['p99_ms']:.2f} -> {new_gw['p99_ms']:.2f}ms  "
+            f"rps {old_gw['rps']} -> {new_gw['rps']}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chi phí proxy của gateway")
+    parser.add_argument("--concurrency", default="1,10,50",
+                        type=lambda value: [int(x) for x in value.split(",") if x])
+    parser.add_argument("--requests", type=int, default=500, help="Số request mỗi lần đo")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [x for x in value.split(",") if x])
+    parser.add_argument("--gateway-port", type=int, default=18000)
+    parser.add_argument("--upstream-port", type=int, default=18001)
+    parser.add_argument("--label", default="", help="Ghi chú cho report (ví dụ tên nhánh)")
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--compare", help="Report JSON trước đó để so sánh")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Kịch bản không tồn tại: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    gateway_url = f"http://127.0.0.1:{args.gateway_port}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "bench.bin"), "wb") as f:
+            f.write(os.urandom(STATIC_FILE_BYTES))
+        # Mọi upstream của gateway trỏ tới upstream giả lập (qua GATEWAY_UPSTREAMS_FILE)
+        upstreams_file = os.path.join(workdir, "upstreams.json")
+        with open(upstreams_file, "w", encoding="utf-8") as f:
+            json.dump({name: [upstream_url] for name in UPSTREAM_NAMES}, f)
+
+        processes: Dict[str, subprocess.Popen] = {}
+        try:
+            processes["upstream"] = start_server(
+                "benchmark:stub_app", args.upstream_port, {"BENCH_STATIC_DIR": workdir}
+            )
+            processes["gateway"] = start_server(
+                "main:app", args.gateway_port, {"GATEWAY_UPSTREAMS_FILE": upstreams_file}
+            )
+            asyncio.run(wait_ready(upstream_url + "/"))
+            asyncio.run(wait_ready(gateway_url + "/_gateway/pools"))
+            results = asyncio.run(run_benchmarks(args, gateway_url, upstream_url))
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.wait(timeout=10)
+
+    report = {
+        "label": args.label,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests_per_run": args.requests,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nĐã ghi report: {args.output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Awaitable, Dict, Optional
+
+from fastapi import APIRouter, Request
+
+from auth_utils import token_verifier
+from deadlines import compute_deadline, with_deadline
+from metrics import label_request
+from upstreams import pool
+
+router = APIRouter(prefix="/bff", tags=["Backend for Frontend"])
+
+# Timeout (giây) cho từng phần của dashboard; phần quá hạn sẽ bị đánh dấu thiếu
+DASHBOARD_PART_TIMEOUTS = {
+    "applications": 3.0,
+    "notifications": 1.5,
+    "conversations": 1.5,
+    "matches": 3.0,
+}
+
+# Số gợi ý trả về trong dashboard
+DASHBOARD_MATCH_LIMIT = 5
+
+
+class PartError(Exception):
+    pass
+
+
+def part_deadline(client_deadline: Optional[float], part: str) -> float:
+    """Deadline của từng phần: timeout riêng của phần đó, không muộn hơn deadline của client."""
+    deadline = time.time() + DASHBOARD_PART_TIMEOUTS[part]
+    if client_deadline is not None:
+        deadline = min(deadline, client_deadline)
+    return deadline
+
+
+def _forward_headers(request: Request) -> dict:
+    headers = {}
+    if request.headers.get("authorization"):
+        headers["authorization"] = request.headers["authorization"]
+    return token_verifier.identity_headers(headers)
+
+
+async def fetch_json(service: str, path: str, headers: dict, params: Optional[dict] = None,
+                     deadline: Optional[float] = None):
+    """Gọi GET tới service qua pool chung (keep-alive, bulkhead, load balancing)."""
+    response = await pool.send(
+        service, "GET", path, params=params,
+        headers=with_deadline(headers, deadline), deadline=deadline
+    )
+    if response.status_code >= 400:
+        raise PartError(f"{service} returned HTTP {response.status_code}")
+    return response.json()
+
+
+async def fetch_matches(user_id: int, headers: dict, deadline: Optional[float] = None):
+    """
+    Lấy hồ sơ sinh viên rồi gọi matching-service với các thông tin trong hồ sơ.
+    Chỉ lấy top DASHBOARD_MATCH_LIMIT ở dạng gọn (không có description): matching-service
+    chỉ chấm/serialize đúng chừng đó kết quả.
+    """
+    profile = await fetch_json("user", f"/student/profile/{user_id}", headers, deadline=deadline)
+    params = {"student_user_id": user_id, "limit": DASHBOARD_MATCH_LIMIT, "compact": "true"}
+    if profile:
+        if profile.get("gpa") is not None:
+            params["gpa"] = profile["gpa"]
+        params["skills"] = profile.get("skills") or ""
+        params["interests"] = profile.get("research_interests") or ""
+    return await fetch_json("matching", "/match/simple", headers, params, deadline)
+
+
+async def gather_parts(parts: Dict[str, Awaitable], timeouts: Dict[str, float]) -> dict:
+    """
+    Chạy đồng thời các phần, mỗi phần có timeout riêng.
+    Phần lỗi/quá hạn trả về None và được ghi vào "errors".
+    """
+    names = list(parts)
+    results = await asyncio.gather(
+        *[asyncio.wait_for(parts[name], timeout=timeouts[name]) for name in names],
+        return_exceptions=True
+    )
+    merged = {}
+    errors = {}
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            merged[name] = None
+            errors[name] = "timeout"
+        elif isinstance(result, Exception):
+            merged[name] = None
+            errors[name] = str(result) or result.__class__.__name__
+        else:
+            merged[name] = result
+    merged["partial"] = bool(errors)
+    merged["errors"] = errors
+    return merged
+
+
+@router.get("/student/{user_id}/dashboard")
+async def student_dashboard(user_id: int, request: Request):
+    """
+    Gộp dữ liệu dashboard của sinh viên trong một lần gọi:
+    hồ sơ ứng tuyển, thông báo, hội thoại và gợi ý cơ hội.
+    """
+    label_request("bff", "student_dashboard")
+    headers = _forward_headers(request)
+    client_deadline = compute_deadline(request.headers, None)
+    parts = {
+        "applications": fetch_json(
+            "application", f"/student/{user_id}", headers,
+            deadline=part_deadline(client_deadline, "applications")
+        ),
+        "notifications": fetch_json(
+            "notification", f"/notifications/{user_id}", headers,
+            deadline=part_deadline(client_deadline, "notifications")
+        ),
+        "conversations": fetch_json(
+            "notification", f"/conversations/{user_id}", headers,
+            deadline=part_deadline(client_deadline, "conversations")
+        ),
+        "matches": fetch_matches(user_id, headers, part_deadline(client_deadline, "matches")),
+    }
+    dashboard = await gather_parts(parts, DASHBOARD_PART_TIMEOUTS)
+    return {"student_user_id": user_id, **dashboard}
@@ -0,0 +1,176 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli  # Tùy chọn: không cài thì chỉ dùng gzip
+except ImportError:
+    brotli = None
+
+# Chỉ nén response lớn hơn ngưỡng này (byte); response nhỏ nén không đáng công CPU
+COMPRESSION_MIN_BYTES = int(os.getenv("GATEWAY_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GATEWAY_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("GATEWAY_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/problem+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+# Luồng sự kiện cần từng chunk tới client ngay, không nén
+EXCLUDED_TYPES = ("text/event-stream",)
+# Status không có body hoặc body không được đổi (206: Content-Range tính trên bản gốc)
+UNCOMPRESSED_STATUSES = {204, 206, 304}
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """Accept-Encoding -> {encoding: q}"""
+    result = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[token] = q
+    return result
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Ưu tiên br (nếu có thư viện brotli) rồi tới gzip, theo q-value của client."""
+    accepted = parse_accept_encoding(accept_encoding)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: định dạng gzip
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware nén response theo Accept-Encoding (br/gzip).
+    Nén theo từng chunk nên bộ nhớ không tăng theo kích thước response; response
+    upstream đã nén (có Content-Encoding) được trả nguyên vẹn.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        # Response không có Content-Length là luồng thật: flush từng chunk để client nhận ngay
+        self.streaming = False
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if (message["status"] in UNCOMPRESSED_STATUSES or message["status"] < 200
+                    or headers.get("content-encoding") or not is_compressible(content_type)):
+                self.passthrough = True
+                await self._send(message)
+                return
+            MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+            length = headers.get("content-length")
+            if length is not None and length.isdigit() and int(length) < self.minimum_size:
+                self.passthrough = True
+                await self._send(message)
+                return
+            self.streaming = length is None
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                # Toàn bộ body nằm trong chunk đầu và nhỏ hơn ngưỡng
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            self.compressor = _Compressor(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # Body đã đổi nên ETag chỉ còn tương đương ở mức "weak"
+                headers["etag"] = "W/" + etag
+            await self._send(self.start_message)
+
+        if more_body:
+            data = self.compressor.compress(body, flush=self.streaming)
+            if data:
+                await self._send({"type": "http.response.body", "body": data, "more_body": True})
+        else:
+            data = self.compressor.compress(body, flush=False) + self.compressor.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": False})
@@ -0,0 +1,66 @@
+import time
+from typing import Optional
+
+import httpx
+from fastapi.responses import JSONResponse
+
+# Thời điểm hết hạn của request (epoch, mili giây), gửi kèm tới các service phía sau
+DEADLINE_HEADER = "X-Request-Deadline"
+
+
+def compute_deadline(headers, budget_ms: Optional[int]) -> Optional[float]:
+    """
+    Deadline (epoch, giây) của request: now + budget của route.
+    Nếu client (hoặc gateway phía trước) đã gửi deadline sớm hơn thì giữ deadline đó.
+    """
+    deadline = None
+    if budget_ms:
+        deadline = time.time() + budget_ms / 1000.0
+    value = headers.get(DEADLINE_HEADER.lower())
+    if value:
+        try:
+            client_deadline = float(value) / 1000.0
+        except ValueError:
+            client_deadline = None
+        if client_deadline is not None and (deadline is None or client_deadline < deadline):
+            deadline = client_deadline
+    return deadline
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def expired(deadline: Optional[float]) -> bool:
+    left = remaining(deadline)
+    return left is not None and left <= 0
+
+
+def with_deadline(headers: dict, deadline: Optional[float]) -> dict:
+    """Bỏ deadline do client gửi và gắn deadline đã tính của gateway."""
+    result = {k: v for k, v in headers.items() if k.lower() != DEADLINE_HEADER.lower()}
+    if deadline is not None:
+        result[DEADLINE_HEADER] = str(int(deadline * 1000))
+    return result
+
+
+def cap_timeout(timeout: httpx.Timeout, deadline: Optional[float]) -> httpx.Timeout:
+    """Giới hạn từng loại timeout của httpx trong thời gian còn lại của request."""
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    left = max(0.001, left)
+
+    def cap(value):
+        return left if value is None else min(value, left)
+
+    return httpx.Timeout(
+        connect=cap(timeout.connect), read=cap(timeout.read),
+        write=cap(timeout.write), pool=cap(timeout.pool),
+    )
+
+
+def deadline_exceeded() -> JSONResponse:
+    return JSONResponse(status_code=504, content={"error": "Request deadline exceeded"})
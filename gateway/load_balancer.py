@@ -0,0 +1,117 @@
+import itertools
+import json
+import os
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+from resilience import UpstreamUnavailable
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+
+
+def normalize_replicas(value: Union[str, List[str], dict]) -> List[str]:
+    """SERVICES/file cấu hình cho phép một URL, danh sách URL hoặc {"replicas": [...]}"""
+    if isinstance(value, dict):
+        value = value.get("replicas", [])
+    if isinstance(value, str):
+        value = [value]
+    return [url.rstrip("/") for url in value]
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        parts = urlsplit(url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.healthy = True
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.connect_failures = 0  # Lỗi kết nối liên tiếp khi gửi request (passive)
+        self.requests_total = 0
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests_total": self.requests_total,
+        }
+
+
+class ReplicaSet:
+    """Danh sách replica của một upstream và thuật toán chọn replica."""
+
+    def __init__(self, name: str, urls: List[str], strategy: str = ROUND_ROBIN,
+                 health_path: str = "/", unhealthy_threshold: int = 2):
+        self.name = name
+        self.strategy = strategy
+        self.health_path = health_path
+        self.unhealthy_threshold = unhealthy_threshold
+        self.replicas: List[Replica] = []
+        self._counter = itertools.count()
+        self.update(urls)
+
+    def update(self, urls: List[str]):
+        """Cập nhật danh sách replica, giữ nguyên trạng thái của các replica cũ còn trong danh sách."""
+        existing = {replica.url: replica for replica in self.replicas}
+        self.replicas = [existing.get(url) or Replica(url) for url in urls]
+
+    def choose(self, exclude=()) -> Replica:
+        """Chọn một replica khỏe; exclude là các replica đã thử trong request này."""
+        candidates = [replica for replica in self.replicas if replica.healthy and replica not in exclude]
+        if not candidates:
+            raise UpstreamUnavailable(self.name, "no healthy replica", 5)
+        index = next(self._counter)
+        if self.strategy == LEAST_OUTSTANDING:
+            # Xoay vòng điểm bắt đầu để các replica bằng nhau được chia đều
+            offset = index % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            return min(rotated, key=lambda replica: replica.outstanding)
+        return candidates[index % len(candidates)]
+
+    def record_health(self, replica: Replica, ok: bool):
+        if ok:
+            replica.consecutive_failures = 0
+            replica.healthy = True
+            return
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.unhealthy_threshold:
+            replica.healthy = False
+
+    def record_connect_failure(self, replica: Replica):
+        """
+        Passive health check: chỉ loại replica sau unhealthy_threshold lỗi kết nối liên tiếp,
+        và không loại replica khỏe cuối cùng (để active health check quyết định) —
+        một lỗi kết nối thoáng qua không được làm cả service trả 503.
+        """
+        replica.connect_failures += 1
+        if replica.connect_failures < self.unhealthy_threshold:
+            return
+        if any(other.healthy for other in self.replicas if other is not replica):
+            replica.healthy = False
+
+    def record_success(self, replica: Replica):
+        replica.connect_failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+def load_replica_file(path: Optional[str]) -> Dict[str, List[str]]:
+    """
+    Đọc danh sách replica từ file JSON (GATEWAY_UPSTREAMS_FILE), ví dụ:
+    {"matching": ["http://matching-service-1:8007", "http://matching-service-2:8007"]}
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load upstreams file {path}: {e}")
+        return {}
+    return {name: normalize_replicas(value) for name, value in data.items()}
@@ -1,7 +1,34 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Response
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
+from upstreams import pool, load_json_env
+from resilience import UpstreamUnavailable
+from route_policies import get_route_policy, has_dot_segments
+from response_cache import response_cache, etag_matches
+from single_flight import single_flight
+from static_cache import static_cache
+from websocket_proxy import websocket_proxy
+from bff import router as bff_router
+from compression import CompressionMiddleware
+from auth_utils import require_admin, token_verifier
+from deadlines import compute_deadline, deadline_exceeded, expired, with_deadline
+from metrics import MetricsMiddleware, metrics, label_request, add_upstream_time, set_upstream_time
+import time
+from typing import Optional
+from proxy_utils import (
+    BODY_METHODS,
+    BodyTooLarge,
+    BufferedResponse,
+    auth_scope,
+    declared_length,
+    filter_request_headers,
+    filter_response_headers,
+    invalid_path,
+    limited_stream,
+    payload_too_large,
+)
 
 app = FastAPI(title="API Gateway")
 
@@ -14,12 +41,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Map tới các service thật
+# Nén response theo Accept-Encoding (gzip, brotli nếu có thư viện)
+app.add_middleware(CompressionMiddleware)
+
+# Đo độ trễ/throughput cho mọi request (middleware ngoài cùng)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Endpoint tổng hợp cho frontend (đăng ký trước route proxy /{service}/{path})
+app.include_router(bff_router)
+
+# Map tới các service thật (mỗi service có thể là một URL hoặc danh sách URL replica)
 SERVICES = {
     "auth": "http://auth-service:8001/auth",
     "application": "http://application-service:8004/api/applications",
     "matching": "http://matching-service:8007",
-    "notification": "http://notification-service:8005/api", 
+    "notification": "http://notification-service:8005/api",
     "opportunity": "http://provider-service:8006/api/opportunities",
     "provider_app": "http://provider-service:8006/api/applications",
     "user": "http://user-service:8002/api",
@@ -27,48 +63,332 @@ SERVICES = {
 }
 
 # NEW: URL cơ sở của Application Service, dùng để truy cập file tĩnh
-APPLICATION_BASE_URL = "http://application-service:8004" 
-
-# Hàm forward request
-async def forward_request(service_url: str, path: str, request: Request):
-    async with httpx.AsyncClient() as client:
-        body = await request.body()
-        headers = dict(request.headers)
-        response = await client.request(
-            request.method,
-            f"{service_url}/{path}",
-            content=body,
-            headers=headers
-        )
-        return response
+APPLICATION_BASE_URL = "http://application-service:8004"
+
+# Header điều kiện/Range của client, bỏ đi khi gateway tự xác thực lại bản trong cache /static
+CONDITIONAL_HEADERS = {"range", "if-range", "if-none-match", "if-modified-since"}
+
+# Upstream nội bộ (không public qua /{service}/...) nhưng vẫn cần client riêng
+INTERNAL_UPSTREAMS = {
+    "static": APPLICATION_BASE_URL,
+}
+
+# Cấu hình pool/timeout/cân bằng tải riêng cho từng upstream (ghi đè DEFAULT_POOL_OPTIONS)
+POOL_OPTIONS = {
+    "matching": {"max_connections": 200, "max_keepalive_connections": 50, "strategy": "least_outstanding"},
+    "opportunity": {"max_connections": 200, "max_keepalive_connections": 50},
+    "notification": {"read_timeout": 10},
+    "storage": {"read_timeout": 120, "write_timeout": 120},
+}
+
+# Bulkhead/circuit breaker riêng cho từng upstream (ghi đè DEFAULT_RESILIENCE_OPTIONS)
+RESILIENCE_OPTIONS = {
+    "notification": {"max_in_flight": 50, "max_queue": 50},
+    "storage": {"max_in_flight": 20, "max_queue": 20, "queue_timeout": 5},
+}
+
+
+@app.on_event("startup")
+async def on_startup():
+    pool.start(
+        {**SERVICES, **INTERNAL_UPSTREAMS},
+        {**POOL_OPTIONS, **load_json_env("GATEWAY_POOL_OPTIONS")},
+        {**RESILIENCE_OPTIONS, **load_json_env("GATEWAY_RESILIENCE_OPTIONS")},
+    )
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await pool.close()
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    # Từ chối nhanh để một service lỗi không chiếm hết kết nối/event loop của gateway
+    return JSONResponse(
+        status_code=503,
+        content={"error": f"Service {exc.service} unavailable ({exc.reason})"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout_handler(request: Request, exc: httpx.TimeoutException):
+    return JSONResponse(status_code=504, content={"error": "Upstream timeout"})
+
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_error_handler(request: Request, exc: httpx.TransportError):
+    return JSONResponse(status_code=502, content={"error": f"Upstream connection error: {exc}"})
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Số liệu độ trễ/throughput theo định dạng Prometheus"""
+    return Response(
+        content=metrics.render(pool.in_flight, websocket_proxy.open),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/_gateway/pools", dependencies=[Depends(require_admin)])
+def pool_stats():
+    """Thống kê connection pool của từng upstream"""
+    return pool.stats()
+
+
+@app.post("/_gateway/upstreams/reload", dependencies=[Depends(require_admin)])
+def reload_upstreams():
+    """Đọc lại danh sách replica từ GATEWAY_UPSTREAMS_FILE"""
+    return {"reloaded": pool.reload_replicas()}
+
+
+@app.get("/_gateway/cache", dependencies=[Depends(require_admin)])
+def cache_stats():
+    """Số liệu hit/miss của response cache"""
+    return response_cache.stats()
+
+
+@app.delete("/_gateway/cache", dependencies=[Depends(require_admin)])
+def clear_cache():
+    response_cache.clear()
+    return {"cleared": True}
+
+
+@app.get("/_gateway/auth", dependencies=[Depends(require_admin)])
+def auth_stats():
+    """Số liệu cache token đã xác thực"""
+    return token_verifier.stats()
+
+
+@app.get("/_gateway/static-cache", dependencies=[Depends(require_admin)])
+def static_cache_stats():
+    """Số liệu cache đĩa của /static (null nếu chưa bật GATEWAY_STATIC_CACHE_DIR)"""
+    return static_cache.stats() if static_cache is not None else None
+
+
+@app.get("/_gateway/websockets", dependencies=[Depends(require_admin)])
+def websocket_stats():
+    """Số WebSocket đang mở tới từng upstream/replica"""
+    return websocket_proxy.stats()
+
+
+@app.get("/_gateway/coalescing", dependencies=[Depends(require_admin)])
+def coalescing_stats():
+    """Số request GET đã được gộp chung lời gọi upstream"""
+    return single_flight.stats()
+
+
+def cached_response(entry: dict, request: Request, cache_status: str) -> Response:
+    """Trả 304 nếu client đã có đúng phiên bản (If-None-Match), ngược lại trả body từ cache."""
+    headers = {**entry["headers"], "x-cache": cache_status}
+    if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        response_cache.not_modified += 1
+        headers.pop("content-length", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], status_code=entry["status_code"], headers=headers)
+
+
+def upstream_headers(request: Request, deadline: Optional[float] = None) -> dict:
+    """Header gửi lên upstream: claims của token đã xác thực (X-User-*) và deadline của request."""
+    headers = token_verifier.identity_headers(filter_request_headers(request.headers))
+    return with_deadline(headers, deadline)
+
+
+# Hàm forward request (đọc toàn bộ body, dùng cho các route thông thường)
+async def forward_request(service: str, path: str, request: Request, policy: dict,
+                          deadline: Optional[float] = None) -> BufferedResponse:
+    body = await request.body()
+    if len(body) > policy["max_body_bytes"]:
+        raise BodyTooLarge()
+    response = await pool.send(
+        service,
+        request.method,
+        f"/{path}",
+        params=request.query_params,
+        content=body,
+        headers=upstream_headers(request, deadline),
+        stream=True,
+        deadline=deadline
+    )
+    failed = None
+    start = time.perf_counter()
+    try:
+        # Đọc raw để body khớp với Content-Encoding/Content-Length của upstream
+        content = b"".join([chunk async for chunk in response.aiter_raw()])
+    except httpx.TransportError:
+        failed = True
+        raise
+    finally:
+        add_upstream_time(time.perf_counter() - start)
+        await pool.finish(service, response, failed)
+    return BufferedResponse(response.status_code, filter_response_headers(response.headers), content)
+
+
+async def stream_request(service: str, path: str, request: Request, policy: dict,
+                         deadline: Optional[float] = None) -> Response:
+    """
+    Chuyển tiếp theo luồng cả hai chiều: body của client được đẩy dần lên upstream,
+    response của upstream được trả dần về client. Mỗi chunk chỉ được đọc tiếp khi
+    chunk trước đã được gửi đi (backpressure tự nhiên của async iterator).
+    """
+    content = None
+    if request.method in BODY_METHODS:
+        content = limited_stream(request.stream(), policy["max_body_bytes"])
+    response = await pool.send(
+        service,
+        request.method,
+        f"/{path}",
+        params=request.query_params,
+        content=content,
+        headers=upstream_headers(request, deadline),
+        stream=True,
+        deadline=deadline
+    )
+    return StreamingResponse(
+        relay_body(service, response),
+        status_code=response.status_code,
+        headers=filter_response_headers(response.headers)
+    )
+
+
+async def relay_body(service: str, response: httpx.Response):
+    """Trả body upstream theo từng chunk; luôn trả slot upstream kể cả khi client ngắt giữa chừng."""
+    failed = None
+    chunks = response.aiter_raw()
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                add_upstream_time(time.perf_counter() - start)
+            yield chunk
+    except httpx.TransportError:
+        failed = True
+        raise
+    finally:
+        await pool.finish(service, response, failed)
+
+@app.websocket("/ws/{user_id}")
+async def proxy_notification_websocket(websocket: WebSocket, user_id: str):
+    """
+    Chuyển tiếp WebSocket thông báo tới notification-service (/ws/{user_id}).
+    Cùng một user luôn được đưa tới cùng một replica để tin nhắn gửi cho user
+    và các kết nối của user nằm trên cùng một tiến trình.
+    """
+    await websocket_proxy.proxy(
+        websocket, "notification", pool.balancers["notification"], f"/ws/{user_id}", user_id
+    )
+
 
 @app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
 async def proxy_static_files(path: str, request: Request):
     """
     Chuyển tiếp request cho các tệp tĩnh (/static/cvs/...) đến Application Service.
-    Ví dụ: Request /static/cvs/file.pdf sẽ được chuyển tiếp thành 
+    Ví dụ: Request /static/cvs/file.pdf sẽ được chuyển tiếp thành
     http://application-service:8004/static/cvs/file.pdf
+    Body được trả theo luồng; Range/If-None-Match/If-Modified-Since được chuyển tiếp,
+    response 206/304 của upstream được trả nguyên vẹn cho client.
     """
     # Xây dựng path đầy đủ trong Application Service
     # path là phần sau /static/ (ví dụ: cvs/app_1_user_1.pdf)
-    target_path = f"/static/{path}" 
-
-    async with httpx.AsyncClient() as client:
-        # Giữ nguyên headers, đặc biệt là Content-Type và Accept-Ranges (nếu có)
-        headers = dict(request.headers)
-        
-        response = await client.request(
-            request.method,
-            f"{APPLICATION_BASE_URL}{target_path}", # Target URL: http://application-service:8004/static/...
-            headers=headers
-        )
-        
-        # Trả về Response
-        return Response(content=response.content, status_code=response.status_code, headers=dict(response.headers))
+    if has_dot_segments(path):
+        return invalid_path()
+    target_path = f"/static/{path}"
+    policy = get_route_policy("static", path, request.method)
+    label_request("static", policy["name"])
+    deadline = compute_deadline(request.headers, policy["deadline_ms"])
+    if expired(deadline):
+        return deadline_exceeded()
+
+    headers = upstream_headers(request, deadline)
+    entry = None
+    if static_cache is not None and request.method == "GET":
+        entry = static_cache.get(target_path)
+        if entry is not None:
+            if static_cache.is_fresh(entry):
+                return static_cache.respond(entry, request.headers)
+            # Hỏi lại upstream bằng validator của bản trong cache (không kèm Range/điều kiện của client)
+            headers = {k: v for k, v in headers.items() if k.lower() not in CONDITIONAL_HEADERS}
+            headers.update(static_cache.revalidate_headers(entry))
+
+    # Target URL: http://application-service:8004/static/...
+    response = await pool.send(
+        "static",
+        request.method,
+        target_path,
+        headers=headers,
+        stream=True,
+        deadline=deadline
+    )
+    if entry is not None and response.status_code == 304:
+        await pool.finish("static", response)
+        static_cache.mark_revalidated(entry)
+        return static_cache.respond(entry, request.headers)
+
+    body = relay_body("static", response)
+    if (static_cache is not None and request.method == "GET"
+            and static_cache.storable(headers, response.status_code, response.headers)):
+        body = static_cache.tee(target_path, response.headers, body)
+    return StreamingResponse(
+        body,
+        status_code=response.status_code,
+        headers=filter_response_headers(response.headers)
+    )
 
 @app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def proxy(service: str, path: str, request: Request):
     if service not in SERVICES:
         return {"error": "Service not found"}
-    resp = await forward_request(SERVICES[service], path, request)
-    return Response(content=resp.content, status_code=resp.status_code, headers=dict(resp.headers))
+    if has_dot_segments(path):
+        return invalid_path()
+    policy = get_route_policy(service, path, request.method)
+    label_request(service, policy["name"])
+    if policy["internal"]:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    if declared_length(request.headers) > policy["max_body_bytes"]:
+        return payload_too_large(policy["max_body_bytes"])
+
+    use_cache = request.method == "GET" and policy["cache_ttl"] > 0
+    if use_cache:
+        cache_key = response_cache.base_key(
+            service, path, request.url.query, request.headers, policy["cache_shared"]
+        )
+        entry = response_cache.get(cache_key, request.headers)
+        if entry is not None:
+            return cached_response(entry, request, "HIT")
+
+    # Deadline của request theo ngân sách của route; các service phía sau dừng khi quá hạn
+    deadline = compute_deadline(request.headers, policy["deadline_ms"])
+    if expired(deadline):
+        return deadline_exceeded()
+
+    try:
+        if policy["stream"]:
+            return await stream_request(service, path, request, policy, deadline)
+        if policy["coalesce"] and request.method == "GET" and not declared_length(request.headers):
+            flight_key = "|".join([
+                request.method, service, path, request.url.query, auth_scope(request.headers)
+            ])
+            start = time.perf_counter()
+            resp = await single_flight.do(
+                flight_key, lambda: forward_request(service, path, request, policy, deadline)
+            )
+            # Request được gộp cũng tính thời gian chờ kết quả upstream chung
+            set_upstream_time(time.perf_counter() - start)
+        else:
+            resp = await forward_request(service, path, request, policy, deadline)
+    except BodyTooLarge:
+        return payload_too_large(policy["max_body_bytes"])
+
+    if use_cache:
+        entry = response_cache.put(service, cache_key, request.headers, resp, policy["cache_ttl"])
+        if entry is not None:
+            return cached_response(entry, request, "MISS")
+    elif request.method != "GET" and resp.status_code < 400:
+        # Dữ liệu của service đã thay đổi, bỏ các response cũ trong cache
+        response_cache.invalidate_service(service)
+    return Response(content=resp.body, status_code=resp.status_code, headers=resp.headers)
@@ -0,0 +1,190 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Các mốc histogram độ trễ (giây)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Thông tin đo của request hiện tại (service, route, thời gian chờ upstream)
+current_record: ContextVar[Optional[dict]] = ContextVar("gateway_metrics_record", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            # [đếm theo bucket..., +Inf, tổng]
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class GatewayMetrics:
+    """
+    Bộ đếm nhẹ (chỉ cộng dồn vào dict) để có thể bật thường trực ở production.
+    Xuất ra định dạng text của Prometheus.
+    """
+
+    def __init__(self):
+        self.requests_total: Dict[Tuple, int] = {}
+        self.request_bytes: Dict[str, int] = {}
+        self.response_bytes: Dict[str, int] = {}
+        self.upstream_errors: Dict[Tuple, int] = {}
+        self.in_flight = 0
+        self.duration = Histogram()
+        self.upstream_duration = Histogram()
+        self.overhead = Histogram()
+
+    def record_upstream_error(self, service: str, kind: str):
+        key = (service, kind)
+        self.upstream_errors[key] = self.upstream_errors.get(key, 0) + 1
+
+    def observe_request(self, service: str, route: str, method: str, status: int,
+                        total: float, upstream: float, bytes_in: int, bytes_out: int):
+        key = (service, route, method, str(status))
+        self.requests_total[key] = self.requests_total.get(key, 0) + 1
+        self.request_bytes[service] = self.request_bytes.get(service, 0) + bytes_in
+        self.response_bytes[service] = self.response_bytes.get(service, 0) + bytes_out
+        labels = (service, route)
+        self.duration.observe(labels, total)
+        self.upstream_duration.observe(labels, upstream)
+        self.overhead.observe(labels, max(0.0, total - upstream))
+
+    def render(self, upstream_in_flight: Dict[str, int], websockets_open: Optional[Dict[str, int]] = None) -> str:
+        lines = []
+        _counter(lines, "gateway_requests_total", "Requests handled by the gateway",
+                 ("service", "route", "method", "status"), self.requests_total)
+        _histogram(lines, "gateway_request_duration_seconds", "Total request latency",
+                   ("service", "route"), self.duration)
+        _histogram(lines, "gateway_upstream_duration_seconds", "Time spent waiting on upstream services",
+                   ("service", "route"), self.upstream_duration)
+        _histogram(lines, "gateway_overhead_seconds", "Request latency not spent on upstream services",
+                   ("service", "route"), self.overhead)
+        _counter(lines, "gateway_request_bytes_total", "Request body bytes received from clients",
+                 ("service",), {(k,): v for k, v in self.request_bytes.items()})
+        _counter(lines, "gateway_response_bytes_total", "Response body bytes sent to clients",
+                 ("service",), {(k,): v for k, v in self.response_bytes.items()})
+        _counter(lines, "gateway_upstream_errors_total", "Upstream errors by kind",
+                 ("service", "kind"), self.upstream_errors)
+        _gauge(lines, "gateway_in_flight_requests", "Requests currently being handled by the gateway",
+               (), {(): self.in_flight})
+        _gauge(lines, "gateway_upstream_in_flight_requests", "Requests currently open to each upstream",
+               ("service",), {(k,): v for k, v in upstream_in_flight.items()})
+        _gauge(lines, "gateway_websocket_connections", "WebSocket connections currently proxied to each upstream",
+               ("service",), {(k,): v for k, v in (websockets_open or {}).items()})
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Tuple, values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter(lines: list, name: str, help_text: str, names: Tuple, values: Dict[Tuple, int]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, labels)} {value}")
+
+
+def _gauge(lines: list, name: str, help_text: str, names: Tuple, values: Dict[Tuple, int]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} gauge")
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, labels)} {value}")
+
+
+def _histogram(lines: list, name: str, help_text: str, names: Tuple, histogram: Histogram):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, series in sorted(histogram.series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, series):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+        cumulative += series[len(histogram.buckets)]
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, labels)} {series[-1]}")
+        lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+
+
+def add_upstream_time(seconds: float):
+    record = current_record.get()
+    if record is not None:
+        record["upstream"] += seconds
+
+
+def set_upstream_time(seconds: float):
+    record = current_record.get()
+    if record is not None:
+        record["upstream"] = seconds
+
+
+def label_request(service: str, route: str):
+    """Gắn nhãn service/route cho request hiện tại (route lấy từ tên policy để giới hạn số series)."""
+    record = current_record.get()
+    if record is not None:
+        record["service"] = service
+        record["route"] = route
+
+
+class MetricsMiddleware:
+    """ASGI middleware đo độ trễ, số byte vào/ra và số request đang xử lý."""
+
+    def __init__(self, app, metrics: GatewayMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        record = {"service": "gateway", "route": None, "upstream": 0.0}
+        token = current_record.set(record)
+        counters = {"in": 0, "out": 0, "status": 500}
+        start = time.perf_counter()
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                counters["in"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                counters["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                counters["out"] += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            self.metrics.in_flight -= 1
+            current_record.reset(token)
+            route = record["route"]
+            if route is None:
+                matched = scope.get("route")
+                route = getattr(matched, "path", "unmatched")
+            self.metrics.observe_request(
+                record["service"], route, scope["method"], counters["status"],
+                time.perf_counter() - start, record["upstream"], counters["in"], counters["out"]
+            )
+
+
+metrics = GatewayMetrics()
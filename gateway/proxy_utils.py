@@ -0,0 +1,91 @@
+import hashlib
+from typing import AsyncIterator, NamedTuple
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+# Header hop-by-hop (RFC 7230 mục 6.1): chỉ có ý nghĩa trên một chặng kết nối
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Methods có body cần chuyển tiếp
+BODY_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class BufferedResponse(NamedTuple):
+    """Response upstream đã đọc hết body (body giữ nguyên dạng raw, chưa giải nén)"""
+    status_code: int
+    headers: dict
+    body: bytes
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def _strip_hop_by_hop(headers) -> dict:
+    # Các header được liệt kê trong "Connection" cũng là hop-by-hop
+    connection_tokens = {
+        token.strip().lower()
+        for token in headers.get("connection", "").split(",")
+        if token.strip()
+    }
+    excluded = HOP_BY_HOP_HEADERS | connection_tokens
+    return {key: value for key, value in headers.items() if key.lower() not in excluded}
+
+
+def filter_request_headers(headers: Headers) -> dict:
+    """Header gửi lên upstream: bỏ hop-by-hop và host (httpx tự đặt host của upstream)."""
+    result = _strip_hop_by_hop(headers)
+    result.pop("host", None)
+    return result
+
+
+def filter_response_headers(headers) -> dict:
+    """Header trả về client: bỏ hop-by-hop của kết nối gateway -> upstream."""
+    return _strip_hop_by_hop(headers)
+
+
+def auth_scope(headers: Headers) -> str:
+    """Hash của Authorization, dùng để tách key theo người dùng mà không lưu token."""
+    authorization = headers.get("authorization", "")
+    return hashlib.sha256(authorization.encode()).hexdigest() if authorization else ""
+
+
+def declared_length(headers: Headers) -> int:
+    try:
+        return int(headers.get("content-length", "0"))
+    except ValueError:
+        return 0
+
+
+async def limited_stream(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Chuyển tiếp body theo từng chunk, dừng lại nếu vượt quá max_bytes."""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise BodyTooLarge()
+        if chunk:
+            yield chunk
+
+
+def payload_too_large(max_bytes: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"error": f"Request body too large (max {max_bytes} bytes)"}
+    )
+
+
+def invalid_path() -> JSONResponse:
+    return JSONResponse(status_code=400, content={"error": "Invalid path"})
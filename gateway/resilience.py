@@ -0,0 +1,159 @@
+import asyncio
+import math
+import os
+import time
+from typing import Optional
+
+# Cấu hình mặc định cho mỗi upstream (có thể override theo từng upstream)
+DEFAULT_RESILIENCE_OPTIONS = {
+    "max_in_flight": int(os.getenv("GATEWAY_MAX_IN_FLIGHT", "100")),  # Số request đồng thời tối đa
+    "max_queue": int(os.getenv("GATEWAY_MAX_QUEUE", "200")),  # Số request được phép chờ slot
+    "queue_timeout": float(os.getenv("GATEWAY_QUEUE_TIMEOUT", "2")),  # Thời gian chờ slot tối đa (giây)
+    "failure_threshold": int(os.getenv("GATEWAY_BREAKER_FAILURES", "5")),  # Số lỗi liên tiếp để mở mạch
+    "reset_timeout": float(os.getenv("GATEWAY_BREAKER_RESET", "10")),  # Thời gian mở mạch trước khi thử lại
+    "half_open_max_calls": 1,  # Số request thăm dò khi ở trạng thái half-open
+}
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream đang bị từ chối nhanh (mạch mở hoặc hàng đợi đầy)"""
+
+    def __init__(self, service: str, reason: str, retry_after: float):
+        super().__init__(f"{service}: {reason}")
+        self.service = service
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker 3 trạng thái:
+    - closed: cho qua, đếm lỗi liên tiếp
+    - open: từ chối ngay cho tới khi hết reset_timeout
+    - half_open: cho một số request thăm dò, thành công thì đóng mạch, lỗi thì mở lại
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, service: str, failure_threshold: int, reset_timeout: float, half_open_max_calls: int):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit open", self.reset_timeout - elapsed)
+            self.state = self.HALF_OPEN
+            self.half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit half-open", self.reset_timeout)
+            self.half_open_calls += 1
+
+    def cancel_call(self):
+        """Lời gọi không hoàn tất (bị hủy/bị từ chối ở bulkhead): trả lại lượt thăm dò."""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record(self, failed: bool):
+        if not failed:
+            self.state = self.CLOSED
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class Bulkhead:
+    """Giới hạn số request đồng thời tới một upstream, kèm hàng đợi có giới hạn."""
+
+    def __init__(self, service: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.service = service
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "queue full", self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "queue timeout", self.queue_timeout)
+            finally:
+                self.waiting -= 1
+        else:
+            await self.semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+
+class UpstreamGuard:
+    """Bulkhead + circuit breaker của một upstream"""
+
+    def __init__(self, service: str, options: dict):
+        self.options = options
+        self.breaker = CircuitBreaker(
+            service,
+            options["failure_threshold"],
+            options["reset_timeout"],
+            options["half_open_max_calls"],
+        )
+        self.bulkhead = Bulkhead(
+            service,
+            options["max_in_flight"],
+            options["max_queue"],
+            options["queue_timeout"],
+        )
+
+    async def acquire(self):
+        # Kiểm tra mạch trước để không chiếm slot khi upstream đang lỗi
+        self.breaker.before_call()
+        try:
+            await self.bulkhead.acquire()
+        except BaseException:
+            self.breaker.cancel_call()
+            raise
+
+    def release(self, failed: Optional[bool]):
+        """failed=None: không có kết quả (ví dụ client hủy request), không tính vào breaker."""
+        self.bulkhead.release()
+        if failed is None:
+            self.breaker.cancel_call()
+        else:
+            self.breaker.record(failed)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.bulkhead.in_flight,
+            "waiting": self.bulkhead.waiting,
+            "rejected_by_breaker": self.breaker.rejected,
+            "rejected_by_bulkhead": self.bulkhead.rejected,
+        }
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers
+
+from proxy_utils import BufferedResponse, auth_scope
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So sánh If-None-Match với ETag (so sánh yếu, bỏ qua tiền tố W/)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def _is_storable(response: BufferedResponse) -> bool:
+    if response.status_code != 200:
+        return False
+    headers = {key.lower(): value for key, value in response.headers.items()}
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    if "set-cookie" in headers or headers.get("vary", "").strip() == "*":
+        return False
+    return True
+
+
+class ResponseCache:
+    """
+    Cache response GET trong bộ nhớ của gateway:
+    - TTL theo từng route (cache_ttl trong ROUTE_POLICIES)
+    - Giới hạn tổng dung lượng, loại bỏ entry ít dùng nhất (LRU)
+    - Key gồm method, path, query, Authorization (trừ route dùng chung) và các header trong Vary
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max(1, max_bytes // 10)
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        # base key -> danh sách header mà upstream khai báo trong Vary
+        self.vary_headers: Dict[str, List[str]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def base_key(self, service: str, path: str, query: str, headers: Headers, shared: bool) -> str:
+        parts = ["GET", service, path, query]
+        if not shared:
+            parts.append(auth_scope(headers))
+        return "|".join(parts)
+
+    def _full_key(self, base_key: str, headers: Headers) -> str:
+        names = self.vary_headers.get(base_key, [])
+        if not names:
+            return base_key
+        return base_key + "|" + "|".join(f"{name}={headers.get(name, '')}" for name in names)
+
+    def get(self, base_key: str, headers: Headers) -> Optional[dict]:
+        key = self._full_key(base_key, headers)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, service: str, base_key: str, headers: Headers, response: BufferedResponse, ttl: float) -> Optional[dict]:
+        if not _is_storable(response) or len(response.body) > self.max_entry_bytes:
+            return None
+        response_headers = dict(response.headers)
+        vary = next((value for key, value in response_headers.items() if key.lower() == "vary"), "")
+        self.vary_headers[base_key] = sorted({name.strip().lower() for name in vary.split(",") if name.strip()})
+        if not any(key.lower() == "etag" for key in response_headers):
+            response_headers["etag"] = make_etag(response.body)
+        key = self._full_key(base_key, headers)
+        if key in self.entries:
+            self._remove(key)
+        entry = {
+            "service": service,
+            "status_code": response.status_code,
+            "headers": response_headers,
+            "body": response.body,
+            "etag": next(value for name, value in response_headers.items() if name.lower() == "etag"),
+            "expires_at": time.monotonic() + ttl,
+            "size": len(response.body) + sum(len(k) + len(v) for k, v in response_headers.items()),
+        }
+        self.entries[key] = entry
+        self.size += entry["size"]
+        self.stores += 1
+        while self.size > self.max_bytes and self.entries:
+            oldest_key = next(iter(self.entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+        return entry
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry["size"]
+
+    def invalidate_service(self, service: str):
+        """Xóa các entry của một service (khi có request ghi thành công tới service đó)."""
+        for key in [key for key, entry in self.entries.items() if entry["service"] == service]:
+            self._remove(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.vary_headers.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache(int(os.getenv("GATEWAY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
@@ -0,0 +1,100 @@
+import re
+from typing import List
+
+# Giá trị mặc định cho mọi route (ghi đè bởi ROUTE_POLICIES)
+DEFAULT_POLICY = {
+    "name": None,
+    "stream": False,  # True: chuyển tiếp body theo luồng, không giữ toàn bộ trong RAM
+    "max_body_bytes": 10 * 1024 * 1024,
+    "cache_ttl": 0,  # > 0: cache response GET trong gateway (giây)
+    "cache_shared": False,  # True: dữ liệu công khai, key cache không phụ thuộc Authorization
+    "coalesce": True,  # Gộp các GET giống hệt nhau đang chạy đồng thời thành một lời gọi upstream
+    "deadline_ms": 15000,  # Ngân sách thời gian của request, truyền xuống service qua X-Request-Deadline
+    "internal": False,  # True: endpoint chỉ dùng giữa các service, gateway không chuyển tiếp (404)
+}
+
+# Chính sách riêng theo route. "pattern" là regex khớp toàn bộ phần path sau /{service}/
+ROUTE_POLICIES: List[dict] = [
+    {
+        # Hồ sơ sinh viên cho đồng bộ của matching-service (gpa, kỹ năng...), không public
+        "name": "user_matching_profiles",
+        "service": "user",
+        "pattern": r"student/profiles/?",
+        "internal": True,
+    },
+    {
+        "name": "opportunity_list",
+        "service": "opportunity",
+        "pattern": r"",
+        "methods": ["GET"],
+        "cache_ttl": 30,
+        "cache_shared": True,
+    },
+    {
+        "name": "opportunity_detail",
+        "service": "opportunity",
+        "pattern": r"\d+",
+        "methods": ["GET"],
+        "cache_ttl": 30,
+        "cache_shared": True,
+    },
+    {
+        # NDJSON: mỗi sinh viên chấm xong được gửi ngay, batch lớn có thể chạy vài phút
+        "name": "matching_batch",
+        "service": "matching",
+        "pattern": r"match/batch",
+        "methods": ["POST"],
+        "stream": True,
+        "deadline_ms": 600000,
+    },
+    {
+        "name": "storage_upload",
+        "service": "storage",
+        "pattern": r"files/upload",
+        "methods": ["POST"],
+        "stream": True,
+        "max_body_bytes": 50 * 1024 * 1024,
+        "deadline_ms": 120000,
+    },
+    {
+        "name": "storage_download",
+        "service": "storage",
+        "pattern": r"files/[^/]+",
+        "methods": ["GET"],
+        "stream": True,
+        "deadline_ms": 120000,
+    },
+    {
+        # File tĩnh (CV...) của application-service, qua route /static/{path}
+        "name": "static",
+        "service": "static",
+        "pattern": r".*",
+        "methods": ["GET", "HEAD"],
+        "stream": True,
+        "deadline_ms": 120000,
+    },
+]
+
+_COMPILED_POLICIES = [
+    (re.compile(policy["pattern"]), policy) for policy in ROUTE_POLICIES
+]
+
+
+def has_dot_segments(path: str) -> bool:
+    """
+    True nếu path có đoạn "." hoặc "..": httpx chuẩn hóa các đoạn này khi gọi upstream,
+    nên path thực tế có thể khác path đã dùng để chọn chính sách (ví dụ route internal).
+    """
+    return any(segment in (".", "..") for segment in path.split("/"))
+
+
+def get_route_policy(service: str, path: str, method: str) -> dict:
+    """Trả về chính sách (đã gộp với DEFAULT_POLICY) của route khớp đầu tiên."""
+    for pattern, policy in _COMPILED_POLICIES:
+        if policy["service"] != service:
+            continue
+        if "methods" in policy and method not in policy["methods"]:
+            continue
+        if pattern.fullmatch(path):
+            return {**DEFAULT_POLICY, **policy}
+    return {**DEFAULT_POLICY, "name": service, "service": service}
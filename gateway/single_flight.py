@@ -0,0 +1,45 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Gộp các request giống hệt nhau đang chạy đồng thời: chỉ request đầu tiên (leader)
+    gọi upstream, các request sau chờ và dùng chung kết quả đã buffer.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self.calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield: client của leader ngắt kết nối không làm hủy lời gọi mà request khác đang chờ
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Đánh dấu exception đã được xử lý kể cả khi không còn ai chờ kết quả
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight_keys": len(self.calls),
+            "upstream_calls": self.leaders,
+            "coalesced_requests": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+single_flight = SingleFlight()
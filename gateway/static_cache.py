@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import AsyncGenerator, Optional
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers
+
+from response_cache import etag_matches
+
+# Bật cache đĩa cho /static bằng cách đặt GATEWAY_STATIC_CACHE_DIR
+STATIC_CACHE_DIR = os.getenv("GATEWAY_STATIC_CACHE_DIR")
+STATIC_CACHE_MAX_BYTES = int(os.getenv("GATEWAY_STATIC_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+STATIC_CACHE_MAX_OBJECT_BYTES = int(os.getenv("GATEWAY_STATIC_CACHE_MAX_OBJECT_BYTES", str(20 * 1024 * 1024)))
+# Trong khoảng này (giây) file trong cache được dùng luôn; quá hạn thì hỏi lại upstream bằng If-None-Match
+STATIC_CACHE_TTL = float(os.getenv("GATEWAY_STATIC_CACHE_TTL", "60"))
+
+# Cache chỉ ghi/xóa trong thư mục con riêng này của GATEWAY_STATIC_CACHE_DIR
+STATIC_CACHE_SUBDIRECTORY = "gateway-static-cache"
+# Tên file do cache ghi: sha256 của path, hoặc file tạm "<sha256>.<pid>.<id>.tmp" khi đang ghi
+_CACHE_FILE_NAME = re.compile(r"[0-9a-f]{64}(\.\d+\.\d+\.tmp)?")
+
+# Header của upstream được lưu kèm file
+STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "content-disposition")
+
+
+def not_modified(request_headers: Headers, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """Điều kiện 304: If-None-Match (ưu tiên) hoặc If-Modified-Since."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return bool(etag) and etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class StaticDiskCache:
+    """
+    Cache LRU trên đĩa cho các file tĩnh hay được xem (CV...). Chỉ lưu response 200
+    đầy đủ, không nén, có ETag hoặc Last-Modified để có thể xác thực lại với upstream.
+    Range/If-Range khi trả từ cache do FileResponse xử lý.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_object_bytes: int, ttl: float):
+        self.directory = os.path.join(directory, STATIC_CACHE_SUBDIRECTORY)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_leftovers()
+
+    def _remove_leftovers(self):
+        """
+        Index chỉ nằm trong RAM nên file còn lại từ lần chạy trước không dùng được.
+        Chỉ xóa file do cache tự ghi (tên đã hash và *.tmp), không đụng tới file khác.
+        """
+        for name in os.listdir(self.directory):
+            if _CACHE_FILE_NAME.fullmatch(name):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _file_path(self, path: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(path.encode()).hexdigest())
+
+    def get(self, path: str) -> Optional[dict]:
+        entry = self.entries.get(path)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(path)
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def revalidate_headers(self, entry: dict) -> dict:
+        """Header điều kiện gửi upstream khi entry đã quá TTL."""
+        headers = {}
+        if entry["headers"].get("etag"):
+            headers["if-none-match"] = entry["headers"]["etag"]
+        if entry["headers"].get("last-modified"):
+            headers["if-modified-since"] = entry["headers"]["last-modified"]
+        return headers
+
+    def mark_revalidated(self, entry: dict):
+        entry["stored_at"] = time.time()
+        self.revalidated += 1
+
+    def respond(self, entry: dict, request_headers: Headers) -> Response:
+        self.hits += 1
+        headers = {**entry["headers"], "x-cache": "HIT"}
+        if not_modified(request_headers, headers.get("etag"), headers.get("last-modified")):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(entry["file"], headers=headers)
+
+    def storable(self, request_headers: dict, status_code: int, headers) -> bool:
+        if status_code != 200 or request_headers.get("range") or headers.get("content-encoding"):
+            return False
+        if not (headers.get("etag") or headers.get("last-modified")):
+            return False
+        if "no-store" in headers.get("cache-control", "").lower():
+            return False
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            return False
+        return length <= self.max_object_bytes
+
+    async def tee(self, path: str, headers, chunks: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+        """
+        Trả từng chunk cho client đồng thời ghi ra file tạm; chỉ đưa vào cache khi
+        nhận đủ body (khớp Content-Length), client ngắt giữa chừng thì bỏ file tạm.
+        """
+        target = self._file_path(path)
+        temp = f"{target}.{os.getpid()}.{id(chunks)}.tmp"
+        expected = int(headers["content-length"])
+        written = 0
+        complete = False
+        try:
+            with open(temp, "wb") as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+                    yield chunk
+            complete = written == expected
+        finally:
+            # Đóng generator bên trong để trả slot upstream kể cả khi client ngắt giữa chừng
+            await chunks.aclose()
+            if complete:
+                os.replace(temp, target)
+                self._add(path, target, written, headers)
+            elif os.path.exists(temp):
+                os.remove(temp)
+
+    def _add(self, path: str, file_path: str, size: int, headers):
+        old = self.entries.pop(path, None)
+        if old is not None:
+            self.size -= old["size"]
+        self.entries[path] = {
+            "file": file_path,
+            "size": size,
+            "headers": {name: headers[name] for name in STORED_HEADERS if headers.get(name)},
+            "stored_at": time.time(),
+        }
+        self.size += size
+        self.stores += 1
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted["size"]
+            self.evictions += 1
+            try:
+                os.remove(evicted["file"])
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+static_cache = (
+    StaticDiskCache(STATIC_CACHE_DIR, STATIC_CACHE_MAX_BYTES, STATIC_CACHE_MAX_OBJECT_BYTES, STATIC_CACHE_TTL)
+    if STATIC_CACHE_DIR else None
+)
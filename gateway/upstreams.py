@@ -0,0 +1,293 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Union
+
+import httpx
+
+from deadlines import cap_timeout, expired
+from load_balancer import ROUND_ROBIN, Replica, ReplicaSet, load_replica_file, normalize_replicas
+from metrics import add_upstream_time, metrics
+from resilience import DEFAULT_RESILIENCE_OPTIONS, UpstreamGuard, UpstreamUnavailable
+
+
+# Cấu hình pool mặc định cho mọi upstream (có thể override bằng biến môi trường)
+DEFAULT_POOL_OPTIONS = {
+    "max_connections": int(os.getenv("GATEWAY_POOL_MAX_CONNECTIONS", "100")),
+    "max_keepalive_connections": int(os.getenv("GATEWAY_POOL_MAX_KEEPALIVE", "20")),
+    "keepalive_expiry": float(os.getenv("GATEWAY_POOL_KEEPALIVE_EXPIRY", "30")),
+    "http2": os.getenv("GATEWAY_POOL_HTTP2", "false").lower() == "true",
+    "connect_timeout": float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "3")),
+    "read_timeout": float(os.getenv("GATEWAY_READ_TIMEOUT", "30")),
+    "write_timeout": float(os.getenv("GATEWAY_WRITE_TIMEOUT", "30")),
+    "pool_timeout": float(os.getenv("GATEWAY_POOL_TIMEOUT", "5")),
+    "strategy": os.getenv("GATEWAY_LB_STRATEGY", ROUND_ROBIN),  # round_robin | least_outstanding
+    "health_path": "/",  # Path health check, tính từ origin của replica
+}
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("GATEWAY_HEALTH_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("GATEWAY_HEALTH_TIMEOUT", "2"))
+# File JSON chứa danh sách replica, được đọc lại khi thay đổi (không cần restart)
+UPSTREAMS_FILE = os.getenv("GATEWAY_UPSTREAMS_FILE")
+
+
+def load_json_env(name: str) -> Dict[str, dict]:
+    """
+    Đọc cấu hình riêng cho từng upstream từ biến môi trường dạng JSON.
+    Ví dụ GATEWAY_POOL_OPTIONS='{"matching": {"max_connections": 200, "http2": true}}'
+    """
+    raw = os.getenv(name)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else {}
+    except ValueError as e:
+        print(f"Invalid {name}: {e}")
+        return {}
+
+
+def breaker_outcome(response: httpx.Response) -> Optional[bool]:
+    """
+    Kết quả của response đối với circuit breaker: True là lỗi, False là thành công,
+    None là không tính. 503 kèm Retry-After (upstream chủ động từ chối do quá tải) và
+    504 (hết deadline của request) không phải lỗi của upstream, không được làm mở mạch.
+    """
+    if response.status_code == 503 and "retry-after" in response.headers:
+        return None
+    if response.status_code == 504:
+        return None
+    return response.status_code >= 500
+
+
+class UpstreamClientPool:
+    """
+    Giữ một httpx.AsyncClient sống lâu cho mỗi upstream, để tái sử dụng kết nối TCP
+    (keep-alive) thay vì mở kết nối mới cho từng request. Mỗi upstream có thể có nhiều
+    replica, được chọn theo round-robin hoặc ít request đang xử lý nhất.
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.options: Dict[str, dict] = {}
+        self.guards: Dict[str, UpstreamGuard] = {}
+        self.balancers: Dict[str, ReplicaSet] = {}
+        self.health_task: Optional[asyncio.Task] = None
+        self.upstreams_file_mtime: Optional[float] = None
+        self.requests_total: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+
+    def start(
+        self,
+        upstreams: Dict[str, Union[str, List[str]]],
+        overrides: Optional[Dict[str, dict]] = None,
+        resilience_overrides: Optional[Dict[str, dict]] = None,
+    ):
+        """Tạo client, guard và danh sách replica cho từng upstream (gọi khi gateway khởi động)."""
+        overrides = overrides or {}
+        resilience_overrides = resilience_overrides or {}
+        for name, urls in {**upstreams, **self._read_upstreams_file(upstreams)}.items():
+            options = {**DEFAULT_POOL_OPTIONS, **overrides.get(name, {})}
+            limits = httpx.Limits(
+                max_connections=options["max_connections"],
+                max_keepalive_connections=options["max_keepalive_connections"],
+                keepalive_expiry=options["keepalive_expiry"],
+            )
+            timeout = httpx.Timeout(
+                connect=options["connect_timeout"],
+                read=options["read_timeout"],
+                write=options["write_timeout"],
+                pool=options["pool_timeout"],
+            )
+            self.clients[name] = httpx.AsyncClient(limits=limits, timeout=timeout, http2=options["http2"])
+            self.options[name] = options
+            self.guards[name] = UpstreamGuard(
+                name, {**DEFAULT_RESILIENCE_OPTIONS, **resilience_overrides.get(name, {})}
+            )
+            self.balancers[name] = ReplicaSet(
+                name, normalize_replicas(urls), options["strategy"], options["health_path"]
+            )
+            self.requests_total[name] = 0
+            self.in_flight[name] = 0
+        self.health_task = asyncio.ensure_future(self._health_loop())
+
+    async def close(self):
+        """Dừng health check và đóng toàn bộ client (gọi khi gateway tắt)."""
+        if self.health_task is not None:
+            self.health_task.cancel()
+            self.health_task = None
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None:
+            raise KeyError(f"Upstream '{name}' chưa được khởi tạo")
+        return client
+
+    async def send(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        *,
+        params=None,
+        headers: Optional[dict] = None,
+        content=None,
+        stream: bool = False,
+        deadline: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        Chọn replica, rồi gửi request qua bulkhead + circuit breaker và client của upstream.
+        path được nối vào URL của replica (ví dụ "/student/1").
+        Có thể raise UpstreamUnavailable (từ chối nhanh) hoặc httpx.TransportError.
+        Với stream=True, slot của upstream chỉ được trả khi gọi finish().
+        deadline (epoch, giây) giới hạn timeout của lời gọi trong thời gian còn lại của request.
+        """
+        client = self.get(name)
+        guard = self.guards[name]
+        replica_set = self.balancers[name]
+        # Body dạng bytes có thể gửi lại; body dạng stream chỉ gửi được một lần
+        retryable = content is None or isinstance(content, (bytes, str))
+        tried = []
+        while True:
+            try:
+                replica = replica_set.choose(tried)
+                await guard.acquire()
+            except UpstreamUnavailable:
+                metrics.record_upstream_error(name, "rejected")
+                raise
+            request = client.build_request(
+                method, f"{replica.url}{path}", params=params, headers=headers, content=content,
+                timeout=cap_timeout(client.timeout, deadline)
+            )
+            self.requests_total[name] += 1
+            self.in_flight[name] += 1
+            replica.requests_total += 1
+            replica.outstanding += 1
+            start = time.perf_counter()
+            try:
+                response = await client.send(request, stream=stream)
+            except httpx.ConnectError:
+                metrics.record_upstream_error(name, "connect")
+                # Không kết nối được: lỗi lặp lại thì bỏ replica khỏi vòng chọn cho tới khi health check
+                # thành công; request chưa tới upstream nên có thể thử replica khác chưa thử
+                replica_set.record_connect_failure(replica)
+                self._release(name, replica, failed=True)
+                tried.append(replica)
+                if retryable and any(other.healthy and other not in tried for other in replica_set.replicas):
+                    continue
+                raise
+            except httpx.TransportError as e:
+                timed_out = isinstance(e, httpx.TimeoutException)
+                metrics.record_upstream_error(name, "timeout" if timed_out else "transport")
+                # Hết thời gian vì deadline của request (không phải vì upstream chậm) thì không tính lỗi
+                self._release(name, replica, failed=None if timed_out and expired(deadline) else True)
+                raise
+            except BaseException:
+                self._release(name, replica, failed=None)
+                raise
+            finally:
+                add_upstream_time(time.perf_counter() - start)
+            break
+        replica_set.record_success(replica)
+        if response.status_code >= 500:
+            metrics.record_upstream_error(name, "http_5xx")
+        if not stream:
+            self._release(name, replica, failed=breaker_outcome(response))
+        else:
+            response.extensions["gateway_replica"] = replica
+        return response
+
+    async def finish(self, name: str, response: httpx.Response, failed: Optional[bool] = None):
+        """Đóng response đã mở bằng send(stream=True) và trả slot cho upstream."""
+        try:
+            await response.aclose()
+        finally:
+            self._release(
+                name,
+                response.extensions.get("gateway_replica"),
+                breaker_outcome(response) if failed is None else failed,
+            )
+
+    def _release(self, name: str, replica: Optional[Replica], failed: Optional[bool]):
+        self.in_flight[name] -= 1
+        if replica is not None:
+            replica.outstanding -= 1
+        self.guards[name].release(failed)
+
+    def _read_upstreams_file(self, known: Dict) -> Dict[str, List[str]]:
+        if UPSTREAMS_FILE and os.path.exists(UPSTREAMS_FILE):
+            self.upstreams_file_mtime = os.path.getmtime(UPSTREAMS_FILE)
+        replicas = {}
+        for name, urls in load_replica_file(UPSTREAMS_FILE).items():
+            if name not in known:
+                print(f"Upstreams file: unknown upstream '{name}', skipped")
+            elif urls:
+                replicas[name] = urls
+        return replicas
+
+    def reload_replicas(self) -> Dict[str, List[str]]:
+        """Đọc lại file replica và cập nhật các upstream đang chạy."""
+        replicas = self._read_upstreams_file(self.balancers)
+        for name, urls in replicas.items():
+            self.balancers[name].update(urls)
+        return replicas
+
+    async def check_health(self):
+        """Active health check: gọi health_path của từng replica (không qua guard)."""
+        checks = []
+        for name, replica_set in self.balancers.items():
+            client = self.clients[name]
+            for replica in replica_set.replicas:
+                checks.append(self._check_replica(client, replica_set, replica))
+        await asyncio.gather(*checks)
+
+    async def _check_replica(self, client: httpx.AsyncClient, replica_set: ReplicaSet, replica: Replica):
+        try:
+            response = await client.get(
+                f"{replica.origin}{replica_set.health_path}", timeout=HEALTH_CHECK_TIMEOUT
+            )
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        replica_set.record_health(replica, ok)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            try:
+                if UPSTREAMS_FILE and os.path.exists(UPSTREAMS_FILE):
+                    if os.path.getmtime(UPSTREAMS_FILE) != self.upstreams_file_mtime:
+                        print(f"Reloading upstream replicas from {UPSTREAMS_FILE}")
+                        self.reload_replicas()
+                await self.check_health()
+            except Exception as e:
+                print(f"Health check error: {e}")
+
+    def stats(self) -> Dict[str, dict]:
+        """Thống kê pool của từng upstream, dùng để điều chỉnh kích thước pool."""
+        result = {}
+        for name, client in self.clients.items():
+            connections = []
+            # httpx không public danh sách kết nối, đọc từ httpcore nếu có
+            transport_pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            if transport_pool is not None:
+                connections = list(getattr(transport_pool, "connections", []))
+            idle = sum(1 for conn in connections if conn.is_idle())
+            result[name] = {
+                "options": self.options[name],
+                "requests_total": self.requests_total[name],
+                "in_flight": self.in_flight[name],
+                "connections": len(connections),
+                "idle_connections": idle,
+                "active_connections": len(connections) - idle,
+                "resilience": self.guards[name].stats(),
+                "load_balancer": self.balancers[name].stats(),
+            }
+        return result
+
+
+pool = UpstreamClientPool()
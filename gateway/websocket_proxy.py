@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import websockets
+from fastapi import WebSocket, WebSocketDisconnect
+from websockets.exceptions import ConnectionClosed
+
+from load_balancer import Replica, ReplicaSet
+
+# Số frame upstream được đệm trước khi ngừng đọc socket upstream (backpressure chiều upstream -> client)
+WS_MAX_QUEUE = int(os.getenv("GATEWAY_WS_MAX_QUEUE", "16"))
+WS_MAX_MESSAGE_BYTES = int(os.getenv("GATEWAY_WS_MAX_MESSAGE_BYTES", str(1024 * 1024)))
+WS_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_WS_CONNECT_TIMEOUT", "5"))
+# Số WebSocket mở tối đa tới mỗi upstream (0: không giới hạn)
+WS_MAX_CONNECTIONS = int(os.getenv("GATEWAY_WS_MAX_CONNECTIONS", "0"))
+
+# Close code khi không mở được kết nối upstream (1013: Try Again Later, 1011: Internal Error)
+CLOSE_TRY_AGAIN = 1013
+CLOSE_UPSTREAM_ERROR = 1011
+# Code chỉ dùng để báo trạng thái, không được gửi trong frame close
+RESERVED_CLOSE_CODES = {1005, 1006, 1015}
+
+
+def _close_code(code: Optional[int]) -> int:
+    if code is None or code in RESERVED_CLOSE_CODES:
+        return 1000
+    return code
+
+
+def sticky_replica(replica_set: ReplicaSet, key: str) -> Replica:
+    """
+    Rendezvous hashing: cùng một key (user_id) luôn tới cùng replica còn healthy,
+    khi thêm/bớt replica chỉ các key của replica đó bị chuyển đi.
+    """
+    candidates = [replica for replica in replica_set.replicas if replica.healthy] or replica_set.replicas
+
+    def weight(replica: Replica) -> bytes:
+        return hashlib.blake2b(f"{replica.origin}|{key}".encode(), digest_size=8).digest()
+
+    return max(candidates, key=weight)
+
+
+def websocket_url(replica: Replica, path: str, query: str) -> str:
+    scheme = "wss" if replica.origin.startswith("https") else "ws"
+    url = f"{scheme}{replica.origin[replica.origin.index(':'):]}{path}"
+    return f"{url}?{query}" if query else url
+
+
+class WebSocketProxy:
+    """Chuyển tiếp frame WebSocket hai chiều giữa client và replica upstream."""
+
+    def __init__(self):
+        self.open: Dict[str, int] = {}
+        self.open_by_replica: Dict[str, int] = {}
+        self.total: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+
+    async def proxy(self, websocket: WebSocket, service: str, replica_set: ReplicaSet,
+                    path: str, sticky_key: str):
+        if WS_MAX_CONNECTIONS and self.open.get(service, 0) >= WS_MAX_CONNECTIONS:
+            self.rejected[service] = self.rejected.get(service, 0) + 1
+            await websocket.close(code=CLOSE_TRY_AGAIN)
+            return
+        replica = sticky_replica(replica_set, sticky_key)
+        url = websocket_url(replica, path, websocket.url.query)
+        subprotocols: List[str] = websocket.scope.get("subprotocols") or []
+        try:
+            upstream = await websockets.connect(
+                url,
+                subprotocols=subprotocols or None,
+                max_queue=WS_MAX_QUEUE,
+                max_size=WS_MAX_MESSAGE_BYTES,
+                open_timeout=WS_CONNECT_TIMEOUT,
+            )
+        except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as e:
+            print(f"WebSocket upstream {url} failed: {e}")
+            self.rejected[service] = self.rejected.get(service, 0) + 1
+            await websocket.close(code=CLOSE_UPSTREAM_ERROR)
+            return
+
+        await websocket.accept(subprotocol=upstream.subprotocol)
+        self._count(service, replica, 1)
+        try:
+            await self._relay(websocket, upstream)
+        finally:
+            self._count(service, replica, -1)
+            await upstream.close()
+
+    async def _relay(self, websocket: WebSocket, upstream):
+        """
+        Mỗi chiều là một task riêng; mỗi frame chỉ được đọc tiếp khi frame trước đã gửi xong,
+        nên chiều chậm không làm đầy bộ nhớ của gateway. Một chiều kết thúc thì đóng cả hai.
+        """
+        to_upstream = asyncio.ensure_future(self._client_to_upstream(websocket, upstream))
+        to_client = asyncio.ensure_future(self._upstream_to_client(websocket, upstream))
+        done, pending = await asyncio.wait({to_upstream, to_client}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                print(f"WebSocket relay error: {task.exception()}")
+
+    async def _client_to_upstream(self, websocket: WebSocket, upstream):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                await upstream.close(code=_close_code(message.get("code")))
+                return
+            if message.get("text") is not None:
+                await upstream.send(message["text"])
+            elif message.get("bytes") is not None:
+                await upstream.send(message["bytes"])
+
+    async def _upstream_to_client(self, websocket: WebSocket, upstream):
+        try:
+            async for data in upstream:
+                if isinstance(data, str):
+                    await websocket.send_text(data)
+                else:
+                    await websocket.send_bytes(data)
+        except ConnectionClosed:
+            pass
+        try:
+            await websocket.close(code=_close_code(upstream.close_code), reason=upstream.close_reason or "")
+        except (RuntimeError, WebSocketDisconnect):
+            pass  # Client đã đóng trước
+
+    def _count(self, service: str, replica: Replica, delta: int):
+        self.open[service] = self.open.get(service, 0) + delta
+        self.open_by_replica[replica.url] = self.open_by_replica.get(replica.url, 0) + delta
+        if delta > 0:
+            self.total[service] = self.total.get(service, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "open": self.open,
+            "open_by_replica": self.open_by_replica,
+            "total": self.total,
+            "rejected": self.rejected,
+        }
+
+
+websocket_proxy = WebSocketProxy()
@@ -4,6 +4,7 @@ from fastapi.staticfiles import StaticFiles
 from database import engine 
 from routes_application import router as app_router
 from sqlmodel import SQLModel
+from deadline_utils import deadline_middleware
 import os
 
 app = FastAPI(
@@ -24,6 +25,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deadline do gateway truyền xuống (X-Request-Deadline)
+app.middleware("http")(deadline_middleware)
+
 @app.on_event("startup")
 def on_startup():
     try:
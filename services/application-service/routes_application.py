@@ -7,6 +7,7 @@ from database import get_session
 import models, schemas
 import httpx 
 import asyncio
+import deadline_utils
 
 # URL của các service khác
 PROVIDER_SERVICE_URL = "http://provider-service:8006" # Port 8006 mới
@@ -49,8 +50,11 @@ async def submit_application(
     # Lấy thông tin Opportunity từ provider-service
     opp_data = None
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{PROVIDER_SERVICE_URL}/api/opportunities/{opportunity_id}")
+        async with httpx.AsyncClient(timeout=deadline_utils.timeout(5.0)) as client:
+            response = await client.get(
+                f"{PROVIDER_SERVICE_URL}/api/opportunities/{opportunity_id}",
+                headers=deadline_utils.propagate_headers()
+            )
             response.raise_for_status()
             opp_data = response.json()
     except (httpx.RequestError, httpx.HTTPStatusError):
@@ -116,7 +120,10 @@ async def get_unread_status_for_app(student_user_id: int, provider_user_id: int,
     Trả về True nếu có tin nhắn chưa đọc cho user_to_check.
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(
+            timeout=deadline_utils.timeout(5.0),
+            headers=deadline_utils.propagate_headers()
+        ) as client:
             # 1. Tạo hoặc lấy Conversation
             convo_resp = await client.post(
                 f"{NOTIFICATION_SERVICE_URL}/api/conversations",
@@ -162,8 +169,12 @@ async def get_applications_by_student(user_id: int, session: Session = Depends(g
     
     # Chuẩn bị tasks cho Opportunity và Unread Status
     tasks = []
+    opp_client = httpx.AsyncClient(
+        timeout=deadline_utils.timeout(5.0),
+        headers=deadline_utils.propagate_headers()
+    )
     for app in applications:
-        opp_coro = httpx.AsyncClient().get(f"{PROVIDER_SERVICE_URL}/api/opportunities/{app.opportunity_id}")
+        opp_coro = opp_client.get(f"{PROVIDER_SERVICE_URL}/api/opportunities/{app.opportunity_id}")
         unread_coro = get_unread_status_for_app(
             student_user_id=app.student_user_id,
             provider_user_id=app.provider_user_id,
@@ -172,11 +183,14 @@ async def get_applications_by_student(user_id: int, session: Session = Depends(g
         )
         tasks.append((app, opp_coro, unread_coro))
         
-    # Chạy tasks đồng thời
-    all_results = await asyncio.gather(*[
-        asyncio.gather(task[1], task[2], return_exceptions=True) 
-        for task in tasks
-    ])
+    # Chạy tasks đồng thời; quá deadline của request thì hủy các lời gọi còn đang chờ
+    try:
+        all_results = await deadline_utils.run_with_deadline(asyncio.gather(*[
+            asyncio.gather(task[1], task[2], return_exceptions=True) 
+            for task in tasks
+        ]))
+    finally:
+        await opp_client.aclose()
     
     # Xử lý kết quả
     for i, result in enumerate(all_results):
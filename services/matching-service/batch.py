@@ -0,0 +1,197 @@
+"""
+Matching hàng loạt: chấm nhiều sinh viên với cùng một snapshot catalog trong process pool,
+trả về NDJSON (mỗi dòng một sinh viên) ngay khi từng nhóm sinh viên chấm xong.
+
+Mọi request batch dùng chung một pool cố định (batch_pool, cùng cách với scoring_pool: worker đọc
+catalog đã biên dịch từ shared memory, xem shared_catalog.py). Mỗi request chỉ gửi tối đa số nhóm bằng số worker vào pool
+một lúc, và tối đa BATCH_MAX_CONCURRENT request chạy đồng thời; vượt quá thì 503 kèm Retry-After.
+
+Dùng qua endpoint POST /match/batch hoặc chạy trực tiếp:
+
+    python batch.py --input students.jsonl --output matches.ndjson --limit 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import AsyncIterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+import shared_catalog
+from catalog import CatalogSnapshot
+from schemas import OpportunityInput, StudentProfile
+from scoring import score_catalog
+from scoring_pool import SCORING_RETRY_AFTER, ScoringPool
+
+# Số worker process của pool batch (dùng chung cho mọi request batch)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+# Số sinh viên gửi cho worker mỗi lần (càng nhỏ kết quả càng về sớm, càng lớn càng ít chi phí IPC)
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "16"))
+# Số sinh viên tối đa trong một request /match/batch
+BATCH_MAX_STUDENTS = int(os.getenv("BATCH_MAX_STUDENTS", "20000"))
+
+# Số request /match/batch được chạy đồng thời
+BATCH_MAX_CONCURRENT = int(os.getenv("BATCH_MAX_CONCURRENT", "2"))
+
+# Pool dùng chung của batch, tách khỏi pool của /match để batch lớn không chiếm chỗ request tương tác.
+# Mỗi batch giữ tối đa BATCH_WORKERS nhóm trong pool; hàng đợi có dư chỗ cho các request đến cùng lúc
+# vượt qua check_capacity() trước khi batch nào kịp bắt đầu stream.
+batch_pool = ScoringPool(BATCH_WORKERS, max(1, BATCH_WORKERS) * BATCH_MAX_CONCURRENT * 4)
+active_batches = 0
+
+
+def _score_chunk(snapshot: CatalogSnapshot, chunk: List[tuple], limit: Optional[int],
+                 include_reasons: bool = True) -> List[str]:
+    """Chấm một nhóm (vị trí, profile dạng dict) trong worker, trả về các dòng NDJSON."""
+    lines = []
+    for position, profile in chunk:
+        student = StudentProfile(**profile)
+        try:
+            results = score_catalog(student, snapshot, limit, include_reasons)
+            row = {
+                "index": position,
+                "student_user_id": student.user_id,
+                "results": [result.dict() for result in results],
+                "total_opportunities": len(snapshot),
+                "catalog_version": snapshot.version,
+            }
+        except Exception as e:
+            row = {"index": position, "student_user_id": student.user_id, "error": str(e)}
+        lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+    return lines
+
+
+def _error_lines(chunk: List[tuple], message: str) -> List[str]:
+    return [
+        json.dumps({"index": position, "student_user_id": profile.get("user_id"), "error": message},
+                   ensure_ascii=False) + "\n"
+        for position, profile in chunk
+    ]
+
+
+def check_capacity():
+    """Gọi trước khi bắt đầu stream: đã có BATCH_MAX_CONCURRENT batch đang chạy thì 503."""
+    if active_batches >= BATCH_MAX_CONCURRENT:
+        raise HTTPException(
+            status_code=503,
+            detail="Đang có quá nhiều batch chạy đồng thời, vui lòng thử lại sau",
+            headers={"Retry-After": SCORING_RETRY_AFTER}
+        )
+
+
+async def stream_matches(
+    snapshot: CatalogSnapshot,
+    students: Sequence[StudentProfile],
+    limit: Optional[int] = None,
+    include_reasons: bool = True,
+    pool: Optional[ScoringPool] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> AsyncIterator[str]:
+    """
+    Chấm students với snapshot trong pool của batch (mặc định batch_pool); các dòng NDJSON được trả
+    theo thứ tự chấm xong (trường "index" là vị trí của sinh viên trong input).
+    """
+    global active_batches
+    if not students:
+        return
+    pool = pool or batch_pool
+    chunks = [
+        [(position, students[position].dict()) for position in range(start, min(start + chunk_size, len(students)))]
+        for start in range(0, len(students), chunk_size)
+    ]
+    # Số nhóm của request này đang nằm trong pool
+    window = max(1, pool.workers)
+    pending = {}
+    next_chunk = 0
+    active_batches += 1
+    try:
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < window:
+                chunk = chunks[next_chunk]
+                task = asyncio.ensure_future(
+                    pool.run(snapshot, _score_chunk, chunk, limit, include_reasons, use_deadline=False)
+                )
+                pending[task] = chunk
+                next_chunk += 1
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                chunk = pending.pop(task)
+                try:
+                    lines = task.result()
+                except HTTPException as e:
+                    # Pool quá tải/worker lỗi: báo lỗi cho từng sinh viên của nhóm, các nhóm khác vẫn tiếp tục
+                    lines = _error_lines(chunk, e.detail)
+                for line in lines:
+                    yield line
+    finally:
+        active_batches -= 1
+        # Client ngắt kết nối giữa chừng: bỏ các nhóm chưa chạy
+        for task in pending:
+            task.cancel()
+
+
+def _read_students(path: str) -> List[StudentProfile]:
+    """Đọc profile từ file JSON (mảng) hoặc JSON Lines; "-" là stdin."""
+    handle = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        text = handle.read()
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        items = json.loads(stripped)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [StudentProfile(**item) for item in items]
+
+
+async def _load_snapshot(opportunities_path: Optional[str]) -> CatalogSnapshot:
+    if opportunities_path:
+        with open(opportunities_path, "r", encoding="utf-8") as f:
+            opportunities = [OpportunityInput(**item) for item in json.load(f)]
+    else:
+        # Lấy catalog từ provider-service giống service (PROVIDER_SERVICE_URL)
+        from main import fetch_opportunities_from_provider
+        opportunities = await fetch_opportunities_from_provider()
+    return CatalogSnapshot(opportunities, version=1, fingerprint="")
+
+
+async def _run_cli(args) -> int:
+    students = _read_students(args.input)
+    snapshot = await _load_snapshot(args.opportunities)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    pool = ScoringPool(args.workers, max(1, args.workers))
+    written = 0
+    try:
+        async for line in stream_matches(
+            snapshot, students, args.limit, not args.no_reasons, pool, args.chunk_size
+        ):
+            output.write(line)
+            written += 1
+    finally:
+        pool.shutdown()
+        shared_catalog.close_all()
+        if output is not sys.stdout:
+            output.close()
+    print(f"Đã chấm {written} sinh viên với {len(snapshot)} opportunities", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Matching hàng loạt sinh viên, xuất NDJSON")
+    parser.add_argument("--input", required=True, help="File profile sinh viên (JSON mảng hoặc JSON Lines, '-' là stdin)")
+    parser.add_argument("--output", default="-", help="File NDJSON kết quả ('-' là stdout)")
+    parser.add_argument("--opportunities", help="File JSON danh sách opportunities (mặc định lấy từ provider-service)")
+    parser.add_argument("--limit", type=int, help="Số kết quả tối đa cho mỗi sinh viên")
+    parser.add_argument("--no-reasons", action="store_true", help="Bỏ match_reasons (chỉ xuất điểm)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    return asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from schemas import OpportunityInput
+
+# Sau khoảng này (giây) catalog được làm mới ở nền; request vẫn dùng bản cũ trong lúc chờ
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "60"))
+
+
+class CatalogSnapshot:
+    """
+    Một phiên bản bất biến của danh sách opportunities. Các cấu trúc dẫn xuất
+    (chỉ mục, ma trận...) được tính một lần cho mỗi snapshot qua derived().
+    """
+
+    def __init__(self, opportunities: Sequence[OpportunityInput], version: int, fingerprint: str):
+        # list được chép thành tuple; Sequence chỉ đọc khác (catalog trong shared memory của worker) giữ nguyên
+        self.opportunities: Sequence[OpportunityInput] = (
+            tuple(opportunities) if isinstance(opportunities, list) else opportunities
+        )
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self._derived: Dict[str, Any] = {}
+
+    def derived(self, name: str, builder: Callable[["CatalogSnapshot"], Any]) -> Any:
+        value = self._derived.get(name)
+        if value is None:
+            value = self._derived[name] = builder(self)
+        return value
+
+    def find(self, opportunity_id: int) -> Optional[OpportunityInput]:
+        by_id = self.derived("by_id", lambda snapshot: {opp.id: opp for opp in snapshot.opportunities})
+        return by_id.get(opportunity_id)
+
+    def __len__(self) -> int:
+        return len(self.opportunities)
+
+
+def _fingerprint(opportunities: List[OpportunityInput]) -> str:
+    payload = json.dumps([opp.dict() for opp in opportunities], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class OpportunityCatalog:
+    """
+    Cache trong tiến trình của danh sách opportunities lấy từ provider-service.
+    Nạp khi khởi động, làm mới ở nền theo TTL và thay snapshot mới bằng một phép gán
+    (request đang chạy vẫn giữ snapshot cũ). Request chỉ phải chờ provider-service khi cache trống.
+    """
+
+    def __init__(self, ttl: float = CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._fetch: Optional[Callable[[], Awaitable[List[OpportunityInput]]]] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Hàm tính trước các cấu trúc dẫn xuất cho snapshot mới, chạy trước khi snapshot được dùng
+        self.warmers: List[Callable[[CatalogSnapshot], None]] = []
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error: Optional[str] = None
+
+    def start(self, fetch: Callable[[], Awaitable[List[OpportunityInput]]]):
+        """Gọi khi service khởi động: nạp lần đầu và làm mới định kỳ ở nền."""
+        self._fetch = fetch
+        self._task = asyncio.ensure_future(self._refresh_loop())
+
+    def add_warmer(self, warmer: Callable[[CatalogSnapshot], None]):
+        self.warmers.append(warmer)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get(self) -> CatalogSnapshot:
+        """Snapshot hiện tại; chỉ chờ provider-service khi chưa có snapshot nào."""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot
+        return await self.refresh()
+
+    async def refresh(self, force: bool = False) -> CatalogSnapshot:
+        """
+        Lấy lại danh sách từ provider-service và thay snapshot. Các lời gọi đồng thời
+        dùng chung một lần tải. Dữ liệu không đổi thì giữ nguyên version.
+        """
+        started = time.time()
+        async with self._lock:
+            snapshot = self.snapshot
+            # Một request khác vừa tải xong trong lúc chờ lock
+            if snapshot is not None and snapshot.loaded_at >= started and not force:
+                return snapshot
+            try:
+                opportunities = await self._fetch()
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = str(getattr(e, "detail", None) or e)
+                raise
+            fingerprint = _fingerprint(opportunities)
+            if snapshot is not None and snapshot.fingerprint == fingerprint:
+                snapshot.loaded_at = time.time()
+            else:
+                version = snapshot.version + 1 if snapshot is not None else 1
+                fresh = CatalogSnapshot(opportunities, version, fingerprint)
+                # Biên dịch trong thread riêng để không chặn event loop, xong mới thay snapshot
+                for warmer in self.warmers:
+                    await asyncio.to_thread(warmer, fresh)
+                self.snapshot = fresh
+            self.refreshes += 1
+            self.last_error = None
+            return self.snapshot
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Catalog refresh failed: {self.last_error or e}")
+            await asyncio.sleep(self.ttl)
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "fingerprint": snapshot.fingerprint if snapshot else None,
+            "opportunities": len(snapshot) if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 3) if snapshot else None,
+            "ttl_seconds": self.ttl,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+        }
+
+
+catalog = OpportunityCatalog()
@@ -0,0 +1,118 @@
+"""
+Tìm từ khóa trong mô tả opportunity mà không phải chuẩn hóa lại mô tả ở mỗi request.
+
+Mỗi mô tả được chuẩn hóa một lần (khi catalog được nạp) thành DescriptionText;
+các bộ từ khóa cố định (research/industry) được tìm bằng automaton Aho-Corasick trong một lượt
+duyệt mô tả. Ngữ nghĩa giữ nguyên như "kw in description.lower().strip()" (khớp substring).
+
+Từ khóa động (sở thích/điểm mạnh của sinh viên) không được nhớ theo mô tả: chúng đến từ request
+nên bộ nhớ sẽ tăng theo input tùy ý. Bộ chấm vector/top-k tra các từ khóa này bằng postings theo
+snapshot (skill_index.KeywordIndex); matcher thuần Python chỉ so substring trên text đã chuẩn hóa.
+"""
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Sequence
+
+# Số mô tả được giữ dạng đã chuẩn hóa (nên >= số opportunity của catalog)
+DESCRIPTION_CACHE_SIZE = int(os.getenv("DESCRIPTION_CACHE_SIZE", "50000"))
+
+
+class KeywordAutomaton:
+    """Automaton Aho-Corasick: tìm mọi pattern xuất hiện trong text bằng một lượt duyệt."""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        # Trạng thái 0 là gốc; goto[state][ký tự] -> state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(frozenset())
+                state = next_state
+            self._output[state] = self._output[state] | {pattern}
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        # Duyệt theo chiều rộng: fail của một trạng thái luôn nông hơn nó
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for state in queue:
+                for char, child in self._goto[state].items():
+                    fallback = self._fail[state]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    target = self._goto[fallback].get(char, 0)
+                    self._fail[child] = target if target != child else 0
+                    self._output[child] = self._output[child] | self._output[self._fail[child]]
+                    next_queue.append(child)
+            queue = next_queue
+
+    def matches(self, text: str) -> FrozenSet[str]:
+        """Tập pattern xuất hiện (substring) trong text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        if "" in self.patterns:
+            found.add("")
+        return frozenset(found)
+
+
+class DescriptionText:
+    """Mô tả đã chuẩn hóa của một opportunity: text và các từ khóa cố định tìm thấy."""
+
+    __slots__ = ("text", "keywords")
+
+    def __init__(self, description: str, automaton: KeywordAutomaton):
+        self.text = description.lower().strip()
+        self.keywords = automaton.matches(self.text)
+
+    def contains(self, term: str) -> bool:
+        """term (đã chuẩn hóa) có là substring của mô tả"""
+        return term in self.text
+
+    def has_any(self, keywords: FrozenSet[str]) -> bool:
+        """Có từ khóa nào (trong các pattern của automaton) xuất hiện trong mô tả"""
+        return not self.keywords.isdisjoint(keywords)
+
+
+class DescriptionCache:
+    """
+    Mô tả gốc -> DescriptionText, nạp sẵn khi catalog được làm mới. Giới hạn kích thước theo
+    thứ tự nạp (mô tả cũ nhất bị bỏ trước) để lần tra cứu trúng cache chỉ là một phép get của dict.
+    """
+
+    def __init__(self, automaton: KeywordAutomaton, size: int = DESCRIPTION_CACHE_SIZE):
+        self.automaton = automaton
+        self.size = size
+        self._items: Dict[str, DescriptionText] = {}
+        # warm() chạy trong thread của catalog, song song với request
+        self._lock = threading.Lock()
+
+    def get(self, description: str) -> DescriptionText:
+        item = self._items.get(description)
+        if item is None:
+            item = DescriptionText(description, self.automaton)
+            with self._lock:
+                self._items[description] = item
+                if len(self._items) > self.size:
+                    self._items.pop(next(iter(self._items)))
+        return item
+
+    def warm(self, descriptions: Iterable[str]):
+        for description in descriptions:
+            self.get(description)
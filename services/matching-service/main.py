@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import httpx
 import os
-from typing import List
-import matcher
+from typing import List, Optional
+import batch
+import deadline_utils
+import pagination
+import shared_catalog
+from catalog import catalog
+from gateway_claims import SERVICE_SHARED_SECRET, gateway_claims, require_admin
+from student_store import student_store
+from scoring import warm_snapshot
+from scoring_pool import scoring_pool
+from result_cache import result_cache
 from schemas import (
+    AnyMatchResponse,
     StudentProfile,
     OpportunityInput,
     CriteriaInput,
     MatchRequest,
-    MatchResponse,
+    BatchMatchRequest,
     MatchResult
 )
 
@@ -23,12 +34,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deadline do gateway truyền xuống (X-Request-Deadline)
+app.middleware("http")(deadline_utils.deadline_middleware)
+
 # URL của provider-service (có thể override bằng environment variable)
 PROVIDER_SERVICE_URL = os.getenv(
     "PROVIDER_SERVICE_URL",
     "http://provider-service:8006"
 )
 
+# URL của user-service (hồ sơ sinh viên cho matching ngược)
+USER_SERVICE_URL = os.getenv(
+    "USER_SERVICE_URL",
+    "http://user-service:8002"
+)
+
+
+@app.on_event("startup")
+async def on_startup():
+    # Nạp catalog opportunities ở nền, không chặn service khởi động nếu provider-service chưa sẵn sàng
+    catalog.add_warmer(warm_snapshot)
+    catalog.add_warmer(scoring_pool.warm)
+    catalog.add_warmer(batch.batch_pool.warm)
+    catalog.start(fetch_opportunities_from_provider)
+    student_store.start(fetch_student_profiles_page)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await catalog.stop()
+    await student_store.stop()
+    scoring_pool.shutdown()
+    batch.batch_pool.shutdown()
+    shared_catalog.close_all()
+
 
 @app.get("/")
 def root():
@@ -40,8 +79,11 @@ async def fetch_opportunities_from_provider() -> List[OpportunityInput]:
     Lấy danh sách opportunities từ provider-service
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{PROVIDER_SERVICE_URL}/api/opportunities/")
+        async with httpx.AsyncClient(timeout=deadline_utils.timeout(10.0)) as client:
+            response = await client.get(
+                f"{PROVIDER_SERVICE_URL}/api/opportunities/",
+                headers=deadline_utils.propagate_headers()
+            )
             response.raise_for_status()
             data = response.json()
             
@@ -69,6 +111,11 @@ async def fetch_opportunities_from_provider() -> List[OpportunityInput]:
                 opportunities.append(opportunity)
             
             return opportunities
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="Hết thời gian chờ provider-service"
+        )
     except httpx.RequestError as e:
         raise HTTPException(
             status_code=503,
@@ -86,10 +133,155 @@ async def fetch_opportunities_from_provider() -> List[OpportunityInput]:
         )
 
 
-@app.post("/match", response_model=MatchResponse)
-async def match_student_to_opportunities(request: MatchRequest):
+async def fetch_student_profiles_page(updated_after: Optional[str], after_user_id: int, limit: int) -> dict:
+    """
+    Lấy một trang hồ sơ sinh viên từ user-service, sắp theo (updated_at, user_id)
+    """
+    params = {"after_user_id": after_user_id, "limit": limit}
+    if updated_after is not None:
+        params["updated_after"] = updated_after
+    try:
+        async with httpx.AsyncClient(timeout=deadline_utils.timeout(10.0)) as client:
+            response = await client.get(
+                f"{USER_SERVICE_URL}/api/student/profiles",
+                params=params,
+                # Endpoint nội bộ của user-service: chỉ nhận lời gọi kèm bí mật chung
+                headers=deadline_utils.propagate_headers({"X-Service-Secret": SERVICE_SHARED_SECRET})
+            )
+            response.raise_for_status()
+            return response.json()
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="Hết thời gian chờ user-service"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Không thể kết nối tới user-service: {str(e)}"
+        )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Lỗi từ user-service: {e.response.text}"
+        )
+
+
+@app.get("/catalog", dependencies=[Depends(require_admin)])
+def catalog_stats():
+    """Trạng thái catalog opportunities đang cache (version, số lượng, tuổi)"""
+    return catalog.stats()
+
+
+@app.post("/catalog/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_catalog():
+    """Tải lại catalog ngay từ provider-service (ví dụ sau khi opportunity thay đổi)"""
+    await catalog.refresh(force=True)
+    return catalog.stats()
+
+
+@app.get("/scoring/pool", dependencies=[Depends(require_admin)])
+def scoring_pool_stats():
+    """
+    Trạng thái process pool chấm điểm (số request đang chấm, bị từ chối vì quá tải), kèm pool của batch
+    và các block shared memory chứa catalog đã biên dịch
+    """
+    return {
+        **scoring_pool.stats(),
+        "batch": {**batch.batch_pool.stats(), "active_batches": batch.active_batches},
+        "shared_catalog": shared_catalog.stats(),
+    }
+
+
+@app.get("/cache/results", dependencies=[Depends(require_admin)])
+def result_cache_stats():
+    """Thống kê cache kết quả matching (hit ratio, số mục, số lần bị bỏ)"""
+    return result_cache.stats()
+
+
+@app.get("/students/store", dependencies=[Depends(require_admin)])
+def student_store_stats():
+    """Trạng thái kho hồ sơ sinh viên dùng cho matching ngược"""
+    return student_store.stats()
+
+
+@app.post("/students/store/refresh", dependencies=[Depends(require_admin)])
+async def refresh_student_store(full: bool = False):
+    """Đồng bộ ngay các hồ sơ thay đổi từ user-service (full=true: tải lại toàn bộ)"""
+    await student_store.refresh(full=full)
+    return student_store.stats()
+
+
+@app.get("/match/opportunity/{opportunity_id}/candidates")
+async def match_candidates(
+    opportunity_id: int,
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    claims: Optional[dict] = Depends(gateway_claims)
+):
+    """
+    Xếp hạng sinh viên phù hợp nhất cho một opportunity (cùng công thức điểm với /match),
+    phân trang theo limit/offset. Chỉ provider sở hữu opportunity hoặc admin được gọi;
+    kết quả chỉ gồm student_user_id và điểm (không có lý do khớp).
+    """
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Cần đăng nhập")
+    role = claims.get("role")
+    if role not in ("provider", "admin"):
+        raise HTTPException(status_code=403, detail="Chỉ provider hoặc admin được xem ứng viên")
+
+    snapshot = await catalog.get()
+    opportunity = snapshot.find(opportunity_id)
+    if opportunity is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy opportunity")
+    if role == "provider" and opportunity.provider_user_id != claims["user_id"]:
+        raise HTTPException(status_code=403, detail="Opportunity không thuộc provider này")
+
+    students = await student_store.get()
+    results = students.rank(opportunity, limit, offset)
+    return {
+        "opportunity_id": opportunity_id,
+        "results": results,
+        "total_students": students.size,
+        "students_version": student_store.version,
+        "limit": limit,
+        "offset": offset
+    }
+
+
+async def match_page(
+    student_profile: StudentProfile,
+    snapshot,
+    limit: Optional[int],
+    offset: int,
+    include_reasons: bool
+):
+    """Chấm top-(offset + limit) (qua cache kết quả) rồi cắt trang; trả về (trang, next_offset)"""
+    window = pagination.scoring_window(limit, offset)
+    match_results = await result_cache.get_or_score(
+        student_profile, snapshot.version, window,
+        lambda: scoring_pool.score(student_profile, snapshot, window, include_reasons),
+        include_reasons
+    )
+    return pagination.page(match_results, limit, offset, len(snapshot))
+
+
+@app.post("/match", response_model=AnyMatchResponse)
+async def match_student_to_opportunities(
+    request: MatchRequest,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    include_reasons: bool = True,
+    fields: Optional[str] = None,
+    compact: bool = False
+):
     """
     Matching sinh viên với các opportunities
+    - limit, offset: trang [offset, offset + limit) của danh sách xếp theo điểm (mặc định trả về tất cả);
+      next_offset trong response là offset của trang kế tiếp (null khi đã hết)
+    - include_reasons=false: bỏ match_reasons (cho client chỉ cần điểm)
+    - fields: chỉ trả về các trường này của mỗi kết quả, ví dụ fields=opportunity_id,score
+    - compact=true: bỏ description (CompactMatchResult)
     
     Request body:
     {
@@ -113,26 +305,24 @@ async def match_student_to_opportunities(request: MatchRequest):
                 detail="student_user_id phải khớp với student_profile.user_id"
             )
         
-        # Lấy danh sách opportunities từ provider-service
-        opportunities = await fetch_opportunities_from_provider()
+        selected = pagination.parse_fields(fields, compact)
+        if selected is not None and "match_reasons" not in selected:
+            include_reasons = False
         
-        if not opportunities:
-            return MatchResponse(
-                student_user_id=request.student_user_id,
-                results=[],
-                total_opportunities=0
-            )
+        # Lấy danh sách opportunities từ catalog (chỉ gọi provider-service khi cache trống)
+        snapshot = await catalog.get()
+        
+        if not len(snapshot):
+            return pagination.build_response(request.student_user_id, [], selected, 0, offset, limit)
         
         # Thực hiện matching
-        match_results = matcher.match_opportunities(
-            request.student_profile,
-            opportunities
+        match_results, next_offset = await match_page(
+            request.student_profile, snapshot, limit, offset, include_reasons
         )
         
-        return MatchResponse(
-            student_user_id=request.student_user_id,
-            results=match_results,
-            total_opportunities=len(opportunities)
+        # Đầy đủ, gọn hoặc chỉ các trường được chọn (xem AnyMatchResponse)
+        return pagination.build_response(
+            request.student_user_id, match_results, selected, len(snapshot), offset, limit, next_offset
         )
         
     except HTTPException:
@@ -144,18 +334,52 @@ async def match_student_to_opportunities(request: MatchRequest):
         )
 
 
-@app.get("/match/simple")
+@app.post("/match/batch")
+async def match_batch(
+    request: BatchMatchRequest,
+    limit: Optional[int] = Query(None, ge=1),
+    include_reasons: bool = True
+):
+    """
+    Matching nhiều sinh viên với cùng một snapshot catalog, chấm song song trong process pool.
+    Trả về NDJSON: mỗi dòng là kết quả của một sinh viên, gửi ngay khi sinh viên đó chấm xong
+    (thứ tự có thể khác input, trường "index" là vị trí trong danh sách students).
+    include_reasons=false bỏ match_reasons để chấm nhanh hơn khi chỉ cần điểm.
+    """
+    if len(request.students) > batch.BATCH_MAX_STUDENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tối đa {batch.BATCH_MAX_STUDENTS} sinh viên mỗi request"
+        )
+    batch.check_capacity()
+    snapshot = await catalog.get()
+    return StreamingResponse(
+        batch.stream_matches(snapshot, request.students, limit, include_reasons),
+        media_type="application/x-ndjson",
+        headers={"X-Catalog-Version": str(snapshot.version)}
+    )
+
+
+@app.get("/match/simple", response_model=AnyMatchResponse)
 async def match_simple(
     student_user_id: int,
     gpa: float = None,
     skills: str = "",
     goals: str = "",
     strengths: str = "",
-    interests: str = ""
+    interests: str = "",
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    include_reasons: bool = True,
+    fields: Optional[str] = None,
+    compact: bool = False
 ):
     """
     Endpoint đơn giản hơn để matching:
     - skills, goals, strengths, interests: chuỗi phân cách bởi dấu phẩy
+    - limit, offset: trang [offset, offset + limit) của danh sách xếp theo điểm
+    - include_reasons=false: bỏ match_reasons
+    - fields, compact: chọn trường trả về như POST /match
     
     Ví dụ:
     GET /match/simple?student_user_id=1&gpa=3.5&skills=Python,ML&goals=research
@@ -177,38 +401,25 @@ async def match_simple(
             interests=interests_list
         )
         
-        # Lấy opportunities
-        opportunities = await fetch_opportunities_from_provider()
+        selected = pagination.parse_fields(fields, compact)
+        if selected is not None and "match_reasons" not in selected:
+            include_reasons = False
         
-        if not opportunities:
-            return {
-                "student_user_id": student_user_id,
-                "results": [],
-                "total_opportunities": 0
-            }
+        # Lấy opportunities từ catalog
+        snapshot = await catalog.get()
         
-        # Matching
-        match_results = matcher.match_opportunities(student_profile, opportunities)
+        if not len(snapshot):
+            return pagination.build_response(student_user_id, [], selected, 0, offset, limit)
         
-        # Chuyển đổi sang dict để trả về
-        results_dict = [
-            {
-                "opportunity_id": r.opportunity_id,
-                "title": r.title,
-                "description": r.description,
-                "type": r.type,
-                "score": r.score,
-                "match_reasons": r.match_reasons
-            }
-            for r in match_results
-        ]
+        # Matching
+        match_results, next_offset = await match_page(student_profile, snapshot, limit, offset, include_reasons)
         
-        return {
-            "student_user_id": student_user_id,
-            "results": results_dict,
-            "total_opportunities": len(opportunities)
-        }
+        return pagination.build_response(
+            student_user_id, match_results, selected, len(snapshot), offset, limit, next_offset
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,5 +1,24 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from schemas import StudentProfile, OpportunityInput, MatchResult
+from keyword_automaton import DescriptionCache, KeywordAutomaton
+
+# Trọng số của các thành phần điểm
+WEIGHTS = {
+    "gpa": 0.20,
+    "skills": 0.30,
+    "interests": 0.20,
+    "goals": 0.15,
+    "strengths": 0.15,
+}
+
+# Từ khóa nhận diện opportunity hướng nghiên cứu / hướng doanh nghiệp
+RESEARCH_KEYWORDS = ["research", "academic", "study", "thesis", "phd", "master"]
+INDUSTRY_KEYWORDS = ["industry", "job", "career", "work", "internship", "employment"]
+_RESEARCH_SET = frozenset(RESEARCH_KEYWORDS)
+_INDUSTRY_SET = frozenset(INDUSTRY_KEYWORDS)
+
+# Mô tả đã chuẩn hóa (và từ khóa research/industry tìm sẵn) của các opportunity trong catalog
+descriptions = DescriptionCache(KeywordAutomaton(RESEARCH_KEYWORDS + INDUSTRY_KEYWORDS))
 
 
 def _jaccard_similarity(a: set, b: set) -> float:
@@ -61,12 +80,12 @@ def calculate_interests_match(student_interests: List[str], description: str) ->
     if not student_interests:
         return 0.5  # Không có sở thích thì cho điểm trung bình
     
-    description_lower = _normalize_text(description)
+    description_text = descriptions.get(description)
     matched = 0
     
     for interest in student_interests:
         interest_normalized = _normalize_text(interest)
-        if interest_normalized in description_lower:
+        if description_text.contains(interest_normalized):
             matched += 1
     
     # Tỷ lệ số sở thích được tìm thấy
@@ -83,138 +102,221 @@ def calculate_goals_match(student_goals: List[str], opportunity_type: str, descr
     if not student_goals:
         return 0.5
     
-    description_lower = _normalize_text(description)
+    description_text = descriptions.get(description)
     goals_lower = [g.lower() for g in student_goals]
     
-    # Mapping giữa goals và opportunity types
-    research_keywords = ["research", "academic", "study", "thesis", "phd", "master"]
-    industry_keywords = ["industry", "job", "career", "work", "internship", "employment"]
-    
     score = 0.0
     
     # Kiểm tra research goals
     if any("research" in g or "academic" in g for g in goals_lower):
-        if opportunity_type == "research_lab" or any(kw in description_lower for kw in research_keywords):
+        if opportunity_type == "research_lab" or description_text.has_any(_RESEARCH_SET):
             score += 0.5
     
     # Kiểm tra industry goals
     if any("industry" in g or "job" in g or "career" in g for g in goals_lower):
-        if opportunity_type == "program" or any(kw in description_lower for kw in industry_keywords):
+        if opportunity_type == "program" or description_text.has_any(_INDUSTRY_SET):
             score += 0.5
     
     return min(1.0, score)
 
 
-def calculate_strengths_match(student_strengths: List[str], description: str, required_skills: List[str]) -> float:
+def calculate_strengths_match(
+    student_strengths: List[str],
+    description: str,
+    required_skills: List[str],
+    description_score: Optional[float] = None
+) -> float:
     """
     Tính điểm khớp điểm mạnh:
     - Điểm mạnh có thể bù đắp cho kỹ năng thiếu
     - Điểm mạnh được đề cập trong description sẽ được ưu tiên
+    - description_score: điểm liên quan mô tả tính sẵn (BM25), thay cho so khớp substring
     """
     if not student_strengths:
         return 0.5
     
-    description_lower = _normalize_text(description)
+    description_text = descriptions.get(description)
     strengths_set = set(_normalize_list(student_strengths))
     required_skills_set = set(_normalize_list(required_skills))
     
     # Kiểm tra điểm mạnh có trong description
     description_match = 0
-    for strength in strengths_set:
-        if strength in description_lower:
-            description_match += 1
+    if description_score is None:
+        for strength in strengths_set:
+            if description_text.contains(strength):
+                description_match += 1
     
     # Kiểm tra điểm mạnh có liên quan đến kỹ năng yêu cầu
     skill_related = len(strengths_set.intersection(required_skills_set))
     
     # Tính điểm: 50% từ description match, 50% từ skill related
-    desc_score = description_match / len(strengths_set) if strengths_set else 0.0
+    if description_score is not None:
+        desc_score = description_score
+    else:
+        desc_score = description_match / len(strengths_set) if strengths_set else 0.0
     skill_score = skill_related / len(required_skills_set) if required_skills_set else 0.0
     
     return (desc_score * 0.5) + (skill_score * 0.5)
 
 
-def calculate_match_score(student: StudentProfile, opportunity: OpportunityInput) -> Tuple[float, List[str]]:
-    """
-    Tính điểm tổng hợp và lý do khớp
-    Trả về (score, reasons)
-    """
+def match_reasons(
+    student: StudentProfile,
+    opportunity: OpportunityInput,
+    gpa_score: float,
+    skills_score: float,
+    interests_score: float,
+    goals_score: float,
+    strengths_score: float,
+) -> List[str]:
+    """Lý do khớp dựa trên điểm thành phần (dùng chung cho bộ chấm Python và vector_engine)"""
     reasons = []
     criteria = opportunity.criteria
-    
-    # 1. GPA Score (20%)
-    gpa_score = 0.0
+
     if criteria and criteria.gpa_min:
-        gpa_score = calculate_gpa_score(student.gpa or 0.0, criteria.gpa_min)
         if gpa_score >= 1.0:
             reasons.append(f"Đáp ứng yêu cầu GPA ({criteria.gpa_min})")
         elif gpa_score >= 0.7:
             reasons.append(f"GPA gần đạt yêu cầu ({student.gpa:.2f}/{criteria.gpa_min})")
-    else:
-        gpa_score = 1.0  # Không yêu cầu GPA
-    
-    # 2. Skills Match (30%)
+
     required_skills = criteria.skills if criteria else []
-    skills_score = calculate_skills_match(student.skills, required_skills)
     if skills_score > 0.7:
         matched_skills = set(_normalize_list(student.skills)).intersection(set(_normalize_list(required_skills)))
         if matched_skills:
             reasons.append(f"Khớp kỹ năng: {', '.join(list(matched_skills)[:3])}")
     elif skills_score > 0.3:
         reasons.append("Một số kỹ năng phù hợp")
-    
-    # 3. Interests Match (20%)
-    interests_score = calculate_interests_match(student.interests, opportunity.description)
+
     if interests_score > 0.5:
         reasons.append("Phù hợp với sở thích của bạn")
+
+    if goals_score > 0.5:
+        reasons.append(f"Phù hợp với mục tiêu ({', '.join(student.goals[:2])})")
+
+    if strengths_score > 0.6:
+        reasons.append("Điểm mạnh phù hợp với yêu cầu")
+
+    # Nếu không có lý do nào, thêm lý do chung
+    if not reasons:
+        reasons.append("Cơ hội phù hợp với hồ sơ của bạn")
+    return reasons
+
+
+def calculate_match_components(
+    student: StudentProfile,
+    opportunity: OpportunityInput,
+    relevance: Optional[Tuple[float, float]] = None
+) -> Tuple[float, Tuple[float, float, float, float, float]]:
+    """
+    Lượt chấm số (không tạo lý do khớp)
+    Trả về (score, (gpa, skills, interests, goals, strengths))
+    - relevance: (sở thích, điểm mạnh) BM25 của opportunity (text_relevance), thay cho so khớp substring
+    """
+    criteria = opportunity.criteria
+    
+    # 1. GPA Score (20%)
+    gpa_score = 0.0
+    if criteria and criteria.gpa_min:
+        gpa_score = calculate_gpa_score(student.gpa or 0.0, criteria.gpa_min)
+    else:
+        gpa_score = 1.0  # Không yêu cầu GPA
+    
+    # 2. Skills Match (30%)
+    required_skills = criteria.skills if criteria else []
+    skills_score = calculate_skills_match(student.skills, required_skills)
+    
+    # 3. Interests Match (20%)
+    if relevance is not None and student.interests:
+        interests_score = relevance[0]
+    else:
+        interests_score = calculate_interests_match(student.interests, opportunity.description)
     
     # 4. Goals Match (15%)
     goals_score = calculate_goals_match(student.goals, opportunity.type, opportunity.description)
-    if goals_score > 0.5:
-        reasons.append(f"Phù hợp với mục tiêu ({', '.join(student.goals[:2])})")
     
     # 5. Strengths Match (15%)
-    strengths_score = calculate_strengths_match(student.strengths, opportunity.description, required_skills)
-    if strengths_score > 0.6:
-        reasons.append("Điểm mạnh phù hợp với yêu cầu")
+    strengths_score = calculate_strengths_match(
+        student.strengths, opportunity.description, required_skills,
+        relevance[1] if relevance is not None else None
+    )
     
     # Tính điểm tổng hợp với trọng số
     total_score = (
-        gpa_score * 0.20 +
-        skills_score * 0.30 +
-        interests_score * 0.20 +
-        goals_score * 0.15 +
-        strengths_score * 0.15
+        gpa_score * WEIGHTS["gpa"] +
+        skills_score * WEIGHTS["skills"] +
+        interests_score * WEIGHTS["interests"] +
+        goals_score * WEIGHTS["goals"] +
+        strengths_score * WEIGHTS["strengths"]
     )
     
-    # Nếu không có lý do nào, thêm lý do chung
-    if not reasons:
-        reasons.append("Cơ hội phù hợp với hồ sơ của bạn")
-    
-    return round(total_score, 4), reasons
+    components = (gpa_score, skills_score, interests_score, goals_score, strengths_score)
+    return round(total_score, 4), components
+
+
+def calculate_match_score(
+    student: StudentProfile,
+    opportunity: OpportunityInput,
+    relevance: Optional[Tuple[float, float]] = None
+) -> Tuple[float, List[str]]:
+    """
+    Tính điểm tổng hợp và lý do khớp
+    Trả về (score, reasons)
+    """
+    score, components = calculate_match_components(student, opportunity, relevance)
+    return score, match_reasons(student, opportunity, *components)
 
 
-def match_opportunities(student: StudentProfile, opportunities: List[OpportunityInput]) -> List[MatchResult]:
+def build_result(
+    student: StudentProfile,
+    opportunity: OpportunityInput,
+    score: float,
+    components: Optional[Tuple[float, float, float, float, float]],
+    include_reasons: bool = True
+) -> MatchResult:
+    """
+    Lượt giải thích: tạo MatchResult cho một kết quả được trả về.
+    Lý do khớp được tạo từ điểm thành phần khi include_reasons (components chỉ cần khi đó).
+    """
+    return MatchResult(
+        opportunity_id=opportunity.id,
+        title=opportunity.title,
+        description=opportunity.description,
+        type=opportunity.type,
+        score=score,
+        match_reasons=match_reasons(student, opportunity, *components) if include_reasons else []
+    )
+
+
+def match_opportunities(
+    student: StudentProfile,
+    opportunities: List[OpportunityInput],
+    text_index=None,
+    limit: Optional[int] = None,
+    include_reasons: bool = True
+) -> List[MatchResult]:
     """
     Matching các opportunities với student profile
     Trả về danh sách đã được sắp xếp theo điểm số
+    - text_index: BM25Index của đúng danh sách opportunities (chấm sở thích/điểm mạnh theo BM25)
+    - limit: chỉ tạo kết quả cho limit opportunity điểm cao nhất
+    - include_reasons: False thì bỏ qua lý do khớp (cho batch job/máy đọc)
     """
-    results = []
-    
-    for opp in opportunities:
-        score, reasons = calculate_match_score(student, opp)
-        
-        result = MatchResult(
-            opportunity_id=opp.id,
-            title=opp.title,
-            description=opp.description,
-            type=opp.type,
-            score=score,
-            match_reasons=reasons
-        )
-        results.append(result)
+    relevance = None
+    if text_index is not None:
+        relevance = list(zip(
+            text_index.interests_relevance(student).tolist(),
+            text_index.strengths_relevance(student).tolist()
+        ))
+    
+    # Lượt chấm số trên toàn bộ catalog
+    scored = []
+    for position, opp in enumerate(opportunities):
+        score, components = calculate_match_components(student, opp, relevance[position] if relevance else None)
+        scored.append((score, opp, components))
     
     # Sắp xếp theo điểm số giảm dần
-    results.sort(key=lambda x: x.score, reverse=True)
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if limit is not None:
+        scored = scored[:limit]
     
-    return results
+    # Lượt giải thích chỉ cho các kết quả được trả về
+    return [build_result(student, opp, score, components, include_reasons) for score, opp, components in scored]
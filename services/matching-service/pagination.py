@@ -0,0 +1,87 @@
+"""
+Phân trang và chọn trường cho kết quả /match, /match/simple.
+
+Trang [offset, offset + limit) được lấy từ top-(offset + limit) nên chỉ cần chấm/tạo kết quả
+cho đến hết trang; `fields` (hoặc `compact`) chỉ giữ các trường cần thiết của MatchResult,
+nên chi phí serialize tỉ lệ với kích thước trang chứ không phải kích thước catalog.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from schemas import (
+    CompactMatchResponse,
+    CompactMatchResult,
+    MatchResponse,
+    MatchResult,
+    ProjectedMatchResponse
+)
+
+MATCH_RESULT_FIELDS: Tuple[str, ...] = tuple(MatchResult.__fields__)
+# Dạng gọn: bỏ description (phần lớn nhất của mỗi kết quả)
+COMPACT_FIELDS: Tuple[str, ...] = tuple(CompactMatchResult.__fields__)
+
+
+def parse_fields(fields: Optional[str], compact: bool = False) -> Optional[Tuple[str, ...]]:
+    """
+    Chuỗi "opportunity_id,score" -> tuple tên trường; None nghĩa là trả về đầy đủ.
+    Trường không tồn tại trong MatchResult, hoặc compact bỏ hết các trường đã chọn -> 400.
+    """
+    if fields is None:
+        return COMPACT_FIELDS if compact else None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in MATCH_RESULT_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fields không hợp lệ: {', '.join(unknown) or fields!r}; "
+                   f"chọn trong {', '.join(MATCH_RESULT_FIELDS)}"
+        )
+    if compact:
+        names = tuple(name for name in names if name in COMPACT_FIELDS)
+        if not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"compact=true không có trường nào trong fields={fields!r}; "
+                       f"chọn trong {', '.join(COMPACT_FIELDS)}"
+            )
+    return names
+
+
+def scoring_window(limit: Optional[int], offset: int) -> Optional[int]:
+    """Số kết quả điểm cao nhất cần chấm để lấy được trang (None = toàn bộ)"""
+    return offset + limit if limit is not None else None
+
+
+def page(results: Sequence[MatchResult], limit: Optional[int], offset: int,
+         total: int) -> Tuple[Sequence[MatchResult], Optional[int]]:
+    """Cắt trang từ top-k đã sắp xếp; trả về (trang, offset của trang kế tiếp hoặc None)"""
+    end = offset + limit if limit is not None else None
+    next_offset = end if end is not None and end < total else None
+    return results[offset:end], next_offset
+
+
+def project(results: Sequence[MatchResult], fields: Optional[Tuple[str, ...]]) -> List[dict]:
+    """MatchResult -> dict chỉ gồm các trường được chọn"""
+    names = MATCH_RESULT_FIELDS if fields is None else fields
+    return [{name: getattr(result, name) for name in names} for result in results]
+
+
+def build_response(student_user_id: int, results: Sequence[MatchResult], fields: Optional[Tuple[str, ...]],
+                   total: int, offset: int, limit: Optional[int], next_offset: Optional[int] = None):
+    """
+    Response cho /match, /match/simple theo trường được chọn: đầy đủ -> MatchResponse,
+    compact -> CompactMatchResponse, còn lại -> ProjectedMatchResponse
+    """
+    page_info = dict(
+        student_user_id=student_user_id,
+        total_opportunities=total,
+        offset=offset,
+        limit=limit,
+        next_offset=next_offset
+    )
+    if fields is None:
+        return MatchResponse(results=list(results), **page_info)
+    if fields == COMPACT_FIELDS:
+        return CompactMatchResponse(results=project(results, fields), **page_info)
+    return ProjectedMatchResponse(results=project(results, fields), **page_info)
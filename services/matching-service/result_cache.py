@@ -0,0 +1,134 @@
+"""
+Cache kết quả matching theo hồ sơ sinh viên.
+
+Khóa là hash chuẩn hóa của StudentProfile + version catalog + limit (+ có lý do khớp hay không): sinh viên tải lại trang gợi ý
+với hồ sơ không đổi thì dùng lại kết quả, catalog đổi version thì toàn bộ cache bị bỏ một lần.
+Giới hạn theo số mục, tổng số kết quả đang giữ và TTL; bỏ mục ít dùng gần đây nhất trước (LRU).
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from schemas import MatchResult, StudentProfile
+
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "10000"))
+MATCH_CACHE_TTL_SECONDS = float(os.getenv("MATCH_CACHE_TTL_SECONDS", "300"))
+# Tổng số MatchResult tối đa giữ trong cache (kết quả không có limit có thể dài bằng cả catalog)
+MATCH_CACHE_MAX_RESULTS = int(os.getenv("MATCH_CACHE_MAX_RESULTS", "500000"))
+
+
+def profile_key(student: StudentProfile) -> str:
+    """Hash của hồ sơ, không phụ thuộc thứ tự trường"""
+    payload = json.dumps(student.dict(), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class MatchResultCache:
+    """LRU + TTL của kết quả matching, theo version catalog."""
+
+    def __init__(self, size: int = MATCH_CACHE_SIZE, ttl: float = MATCH_CACHE_TTL_SECONDS,
+                 max_results: int = MATCH_CACHE_MAX_RESULTS):
+        self.size = size
+        self.ttl = ttl
+        self.max_results = max_results
+        self._items: "OrderedDict[Tuple[str, Optional[int], bool], Tuple[float, List[MatchResult]]]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._results = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.ttl > 0
+
+    def _sync_version(self, version: int):
+        """Catalog đổi version: bỏ toàn bộ kết quả cũ"""
+        if self._version != version:
+            if self._items:
+                self.invalidations += 1
+            self._items.clear()
+            self._results = 0
+            self._version = version
+
+    def get(self, student: StudentProfile, version: int, limit: Optional[int],
+            include_reasons: bool = True) -> Optional[List[MatchResult]]:
+        if not self.enabled:
+            return None
+        self._sync_version(version)
+        key = (profile_key(student), limit, include_reasons)
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, results = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return results
+
+    def put(self, student: StudentProfile, version: int, limit: Optional[int], results: List[MatchResult],
+            include_reasons: bool = True):
+        if not self.enabled or len(results) > self.max_results:
+            return
+        self._sync_version(version)
+        key = (profile_key(student), limit, include_reasons)
+        if key in self._items:
+            self._remove(key)
+        self._items[key] = (time.monotonic() + self.ttl, results)
+        self._results += len(results)
+        while len(self._items) > self.size or self._results > self.max_results:
+            oldest = next(iter(self._items))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, results = self._items.pop(key)
+        self._results -= len(results)
+
+    async def get_or_score(
+        self,
+        student: StudentProfile,
+        version: int,
+        limit: Optional[int],
+        score: Callable[[], Awaitable[List[MatchResult]]],
+        include_reasons: bool = True,
+    ) -> List[MatchResult]:
+        """Kết quả trong cache nếu có, nếu không thì chấm bằng score() rồi lưu lại."""
+        results = self.get(student, version, limit, include_reasons)
+        if results is None:
+            results = await score()
+            # Catalog có thể đã đổi version trong lúc chấm; chỉ lưu nếu vẫn là version hiện hành
+            if self._version == version:
+                self.put(student, version, limit, results, include_reasons)
+        return results
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._items),
+            "results": self._results,
+            "catalog_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "size": self.size,
+            "ttl_seconds": self.ttl,
+            "max_results": self.max_results,
+        }
+
+
+result_cache = MatchResultCache()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 
 class StudentProfile(BaseModel):
@@ -37,6 +37,11 @@ class MatchRequest(BaseModel):
     student_profile: StudentProfile  # Profile của sinh viên
 
 
+class BatchMatchRequest(BaseModel):
+    """Request matching cho nhiều sinh viên cùng lúc"""
+    students: List[StudentProfile]
+
+
 class MatchResult(BaseModel):
     """Kết quả matching một opportunity"""
     opportunity_id: int
@@ -47,8 +52,47 @@ class MatchResult(BaseModel):
     match_reasons: List[str] = []  # Lý do khớp
 
 
+class CompactMatchResult(BaseModel):
+    """Kết quả matching dạng gọn (không có description), cho danh sách/trang gợi ý"""
+    opportunity_id: int
+    title: str
+    type: str
+    score: float
+    match_reasons: List[str] = []
+
+
 class MatchResponse(BaseModel):
     """Response trả về danh sách opportunities đã được sắp xếp"""
     student_user_id: int
     results: List[MatchResult]
     total_opportunities: int
+    offset: int = 0
+    limit: Optional[int] = None
+    next_offset: Optional[int] = None  # None khi đã hết kết quả
+
+
+class CompactMatchResponse(BaseModel):
+    """Response của /match, /match/simple khi compact=true"""
+    student_user_id: int
+    results: List[CompactMatchResult]
+    total_opportunities: int
+    offset: int = 0
+    limit: Optional[int] = None
+    next_offset: Optional[int] = None
+
+
+class ProjectedMatchResponse(BaseModel):
+    """
+    Response khi chọn trường bằng `fields`: mỗi kết quả chỉ gồm các trường được chọn
+    (tập con tên trường của MatchResult, đã kiểm tra trong pagination.parse_fields)
+    """
+    student_user_id: int
+    results: List[Dict[str, Any]]
+    total_opportunities: int
+    offset: int = 0
+    limit: Optional[int] = None
+    next_offset: Optional[int] = None
+
+
+# response_model của /match, /match/simple: đầy đủ, gọn hoặc chọn trường
+AnyMatchResponse = Union[MatchResponse, CompactMatchResponse, ProjectedMatchResponse]
@@ -0,0 +1,66 @@
+"""
+Chọn bộ chấm điểm và chấm một sinh viên với một snapshot catalog.
+Dùng chung cho các endpoint trong main.py và các worker process của batch.py.
+"""
+import os
+from typing import List, Optional
+
+import matcher
+import skill_index
+import text_relevance
+import vector_engine
+from schemas import MatchResult, StudentProfile
+
+# Bộ chấm điểm: "vector" (NumPy, mặc định) hoặc "python" (matcher.match_opportunities)
+MATCHING_ENGINE = os.getenv("MATCHING_ENGINE", "vector")
+
+
+def warm_snapshot(snapshot):
+    """Tính trước các cấu trúc dẫn xuất mà bộ chấm đang chọn cần cho snapshot"""
+    if MATCHING_ENGINE == "vector":
+        snapshot.derived("vector_engine", vector_engine.compile_snapshot)
+    else:
+        snapshot.derived("skill_index", skill_index.build_index)
+        matcher.descriptions.warm(opp.description for opp in snapshot.opportunities)
+        if text_relevance.TEXT_RELEVANCE == "bm25":
+            snapshot.derived("bm25", text_relevance.build_index)
+
+
+def shared_state(snapshot):
+    """
+    Phần đã biên dịch của snapshot có thể chia sẻ với worker: (mảng NumPy, phần còn lại).
+    Chỉ bộ chấm vector có mảng để chia sẻ; bộ chấm Python trả về rỗng, worker tự dựng chỉ mục.
+    """
+    if MATCHING_ENGINE != "vector":
+        return {}, {}
+    return snapshot.derived("vector_engine", vector_engine.compile_snapshot).export()
+
+
+def restore_snapshot(snapshot, arrays, state):
+    """Gắn phần đã biên dịch nhận từ shared_state() vào snapshot rồi tính nốt phần còn thiếu"""
+    if MATCHING_ENGINE == "vector" and arrays:
+        snapshot.derived(
+            "vector_engine",
+            lambda snapshot: vector_engine.CompiledCatalog.from_shared(snapshot.opportunities, arrays, state)
+        )
+    warm_snapshot(snapshot)
+
+
+def score_catalog(student_profile: StudentProfile, snapshot, limit: Optional[int] = None,
+                  include_reasons: bool = True) -> List[MatchResult]:
+    """
+    Chấm điểm sinh viên với catalog bằng bộ chấm đã chọn.
+    Có limit thì chỉ trả về top-k (bỏ qua các opportunity không thể lọt vào top-k).
+    Lý do khớp chỉ được tạo cho các kết quả trả về, include_reasons=False thì bỏ hẳn.
+    """
+    if MATCHING_ENGINE == "vector":
+        return vector_engine.match_opportunities(student_profile, snapshot, limit, include_reasons)
+    opportunities = list(snapshot.opportunities)
+    if text_relevance.TEXT_RELEVANCE == "bm25":
+        # Cận trên của skill_index dựa trên so khớp substring nên không dùng để cắt tỉa được
+        text_index = snapshot.derived("bm25", text_relevance.build_index)
+        return matcher.match_opportunities(student_profile, opportunities, text_index, limit, include_reasons)
+    if limit is not None:
+        index = snapshot.derived("skill_index", skill_index.build_index)
+        return skill_index.match_top_k(student_profile, index, limit, include_reasons)
+    return matcher.match_opportunities(student_profile, opportunities, include_reasons=include_reasons)
@@ -0,0 +1,157 @@
+"""
+Chấm điểm /match trong process pool thay vì trên event loop.
+
+Pool sống suốt vòng đời service. Worker được tạo bằng "forkserver" (hoặc "spawn"), không fork
+trực tiếp từ tiến trình uvicorn đa luồng (fork khi luồng khác đang giữ lock có thể làm worker treo).
+Catalog được biên dịch một lần cho mỗi version trong tiến trình chính và đặt vào shared memory
+(shared_catalog.py); mỗi lời gọi chỉ gửi (version, tên block) cùng profile sinh viên, worker gắn vào
+block của version mới khi gặp lần đầu rồi dùng lại cho các lời gọi sau.
+Số request đang chờ/đang chấm bị giới hạn; vượt giới hạn thì trả 503 kèm Retry-After.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import deadline_utils
+import shared_catalog
+from catalog import CatalogSnapshot
+from schemas import MatchResult, StudentProfile
+from scoring import score_catalog
+
+# Số worker process chấm điểm; 0 thì chấm ngay trong tiến trình chính (dev/debug)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))
+# Số request tối đa đang chờ hoặc đang chấm trong pool
+SCORING_QUEUE_SIZE = int(os.getenv("SCORING_QUEUE_SIZE", str(max(1, SCORING_WORKERS) * 8)))
+# Giá trị header Retry-After (giây) khi quá tải
+SCORING_RETRY_AFTER = os.getenv("SCORING_RETRY_AFTER", "1")
+
+# Snapshot worker đang dùng và block shared memory chứa nó
+_worker_snapshot: Optional[CatalogSnapshot] = None
+_worker_block: Optional[shared_memory.SharedMemory] = None
+
+
+def _run_in_worker(block: Tuple[int, str], function: Callable, args: tuple):
+    global _worker_snapshot, _worker_block
+    version, name = block
+    if _worker_snapshot is None or _worker_snapshot.version != version:
+        # Bỏ snapshot cũ trước để block cũ không còn view nào, rồi gắn vào block của version mới
+        _worker_snapshot = None
+        if _worker_block is not None:
+            shared_catalog.detach(_worker_block)
+        _worker_block, _worker_snapshot = shared_catalog.attach(name)
+    return function(_worker_snapshot, *args)
+
+
+def _score_student(snapshot: CatalogSnapshot, student: StudentProfile, limit: Optional[int],
+                   include_reasons: bool) -> List[MatchResult]:
+    return score_catalog(student, snapshot, limit, include_reasons)
+
+
+def _context():
+    """forkserver nếu có (Linux/macOS), ngược lại spawn; không dùng fork."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Server (một luồng) nạp sẵn numpy/scipy và bộ chấm, worker fork từ đó nên khởi động nhanh
+        context.set_forkserver_preload(["scoring_pool"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class ScoringPool:
+    """Process pool chấm điểm dùng chung cho mọi version catalog, có hàng đợi giới hạn."""
+
+    def __init__(self, workers: int = SCORING_WORKERS, queue_size: int = SCORING_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[int] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+        return self._pool
+
+    def warm(self, snapshot: CatalogSnapshot):
+        """Warmer của catalog: đặt catalog đã biên dịch vào shared memory trước khi snapshot được dùng"""
+        if self.workers > 0:
+            snapshot.derived("shared_catalog", shared_catalog.SharedCatalog)
+
+    def _release(self, block: shared_catalog.SharedCatalog):
+        self.in_flight -= 1
+        self.completed += 1
+        block.release()
+
+    async def score(self, student: StudentProfile, snapshot: CatalogSnapshot,
+                    limit: Optional[int] = None, include_reasons: bool = True) -> List[MatchResult]:
+        """Chấm sinh viên với snapshot trong pool; quá tải thì 503."""
+        return await self.run(snapshot, _score_student, student, limit, include_reasons)
+
+    async def run(self, snapshot: CatalogSnapshot, function: Callable, *args, use_deadline: bool = True):
+        """
+        Chạy function(snapshot, *args) trong worker của pool (function phải ở mức module để pickle được).
+        Quá tải thì 503; use_deadline=False thì không cắt theo deadline của request (ví dụ khi đang stream).
+        """
+        if self.workers <= 0:
+            return function(snapshot, *args)
+        if self.in_flight >= self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Matching service đang quá tải, vui lòng thử lại sau",
+                headers={"Retry-After": SCORING_RETRY_AFTER}
+            )
+        loop = asyncio.get_running_loop()
+        block = snapshot.derived("shared_catalog", shared_catalog.SharedCatalog)
+        reference = block.acquire()
+        try:
+            future = self._executor().submit(_run_in_worker, reference, function, args)
+        except BrokenProcessPool:
+            block.release()
+            self._discard()
+            raise HTTPException(status_code=503, detail="Worker chấm điểm bị lỗi, vui lòng thử lại")
+        self.in_flight += 1
+        self._version = snapshot.version
+        # Giải phóng chỗ (và block) khi worker thực sự xong, kể cả khi request đã hết deadline
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self._release, block))
+        try:
+            waiter = asyncio.wrap_future(future)
+            return await (deadline_utils.run_with_deadline(waiter) if use_deadline else waiter)
+        except BrokenProcessPool:
+            self._discard()
+            raise HTTPException(status_code=503, detail="Worker chấm điểm bị lỗi, vui lòng thử lại")
+
+    def _discard(self):
+        """Bỏ pool hỏng (worker bị kill/OOM); request sau tạo pool mới."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self.restarts += 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "catalog_version": self._version,
+        }
+
+
+scoring_pool = ScoringPool()
@@ -0,0 +1,188 @@
+"""
+Catalog đã biên dịch đặt trong shared memory cho các worker chấm điểm.
+
+Tiến trình chính biên dịch mỗi version catalog một lần (warmer của catalog, ngoài event loop) rồi chép
+các mảng NumPy của bộ chấm vector vào một block multiprocessing.shared_memory. Worker gắn vào block
+theo tên và dùng view chỉ đọc trên các mảng đó, không biên dịch lại và không giữ bản sao riêng.
+Mỗi opportunity được pickle riêng vào block; worker chỉ giải pickle các opportunity thực sự có trong
+kết quả trả về (SharedOpportunities). Phần còn lại là đối tượng Python nhỏ (từ vựng kỹ năng/BM25)
+được pickle ở đầu block. Riêng text mô tả đã chuẩn hóa phải là str trong worker để tìm từ khóa,
+nên mỗi worker giải mã một bản từ block.
+
+Block được đếm số lời gọi đang dùng; khi đã có lời gọi dùng version mới hơn và không còn lời gọi nào
+dùng block cũ thì block cũ bị unlink. Request còn giữ snapshot cũ sau lúc đó sẽ tạo lại block.
+"""
+import pickle
+import struct
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import CatalogSnapshot
+from schemas import OpportunityInput
+from scoring import restore_snapshot, shared_state
+
+# Độ dài phần pickle ở đầu block
+_HEADER = struct.Struct("<Q")
+# Mỗi mảng bắt đầu ở offset chia hết cho giá trị này
+_ALIGNMENT = 64
+
+_lock = threading.Lock()
+# version -> block chưa bị unlink
+_live: Dict[int, "SharedCatalog"] = {}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+class SharedOpportunities(Sequence):
+    """Danh sách opportunities chỉ đọc trong shared memory; mỗi phần tử được giải pickle khi cần lần đầu."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self._offsets = offsets
+        self._data = data
+        self._items: List[Optional[OpportunityInput]] = [None] * (len(offsets) - 1)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("opportunity index out of range")
+        item = self._items[index]
+        if item is None:
+            start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+            item = self._items[index] = pickle.loads(self._data[start:end])
+        return item
+
+
+class SharedCatalog:
+    """Block shared memory của một version catalog (builder cho CatalogSnapshot.derived())."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        arrays, state = shared_state(snapshot)
+        rows = [pickle.dumps(opp, protocol=pickle.HIGHEST_PROTOCOL) for opp in snapshot.opportunities]
+        arrays = {
+            **{f"engine_{name}": array for name, array in arrays.items()},
+            "opportunity_offsets": np.concatenate(
+                ([0], np.cumsum([len(row) for row in rows], dtype=np.int64))
+            ).astype(np.int64),
+            "opportunity_data": np.frombuffer(b"".join(rows), dtype=np.uint8),
+        }
+        self._arrays: Dict[str, np.ndarray] = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        # Tên mảng -> (dtype, shape, offset tính từ đầu phần dữ liệu)
+        self._layout: Dict[str, Tuple[str, Tuple[int, ...], int]] = {}
+        offset = 0
+        for name, array in self._arrays.items():
+            self._layout[name] = (array.dtype.str, array.shape, offset)
+            offset = _aligned(offset + array.nbytes)
+        self._meta = pickle.dumps({
+            "version": snapshot.version,
+            "fingerprint": snapshot.fingerprint,
+            "state": state,
+            "arrays": self._layout,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        self._data_start = _aligned(_HEADER.size + len(self._meta))
+        self.nbytes = self._data_start + offset
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self.pending = 0
+        self.retired = False
+        self._create()
+
+    def _create(self):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, self.nbytes))
+        _HEADER.pack_into(shm.buf, 0, len(self._meta))
+        shm.buf[_HEADER.size:_HEADER.size + len(self._meta)] = self._meta
+        for name, (_dtype, _shape, offset) in self._layout.items():
+            array = self._arrays[name]
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=self._data_start + offset)
+            view[...] = array
+            del view
+        self._shm = shm
+        with _lock:
+            _live[self.version] = self
+
+    def acquire(self) -> Tuple[int, str]:
+        """
+        Giữ block cho một lời gọi worker, trả về (version, tên block) gửi kèm lời gọi.
+        Các block của version cũ hơn không còn được giữ thì bị unlink.
+        """
+        if self._shm is None:
+            # Block đã bị unlink (snapshot cũ được dùng lại sau khi đã có version mới): tạo lại
+            self._create()
+        with _lock:
+            self.pending += 1
+            for other in list(_live.values()):
+                if other.version < self.version:
+                    other.retired = True
+                    other._unlink_if_idle()
+            return self.version, self._shm.name
+
+    def release(self):
+        with _lock:
+            self.pending -= 1
+            self._unlink_if_idle()
+
+    def _unlink_if_idle(self):
+        # Gọi khi đang giữ _lock
+        if self.retired and self.pending <= 0 and self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            if _live.get(self.version) is self:
+                del _live[self.version]
+
+
+def attach(name: str) -> Tuple[shared_memory.SharedMemory, CatalogSnapshot]:
+    """Trong worker: gắn vào block và dựng snapshot dùng view chỉ đọc trên các mảng"""
+    shm = shared_memory.SharedMemory(name=name)
+    (meta_length,) = _HEADER.unpack_from(shm.buf, 0)
+    with shm.buf[_HEADER.size:_HEADER.size + meta_length] as meta_view:
+        meta = pickle.loads(meta_view)
+    data_start = _aligned(_HEADER.size + meta_length)
+    arrays: Dict[str, np.ndarray] = {}
+    for array_name, (dtype, shape, offset) in meta["arrays"].items():
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=data_start + offset)
+        array.flags.writeable = False
+        arrays[array_name] = array
+    opportunities = SharedOpportunities(arrays.pop("opportunity_offsets"), arrays.pop("opportunity_data"))
+    snapshot = CatalogSnapshot(opportunities, meta["version"], meta["fingerprint"])
+    engine_arrays = {name[len("engine_"):]: array for name, array in arrays.items()}
+    restore_snapshot(snapshot, engine_arrays, meta["state"])
+    return shm, snapshot
+
+
+def detach(shm: shared_memory.SharedMemory):
+    """Trong worker: bỏ block của version cũ (sau khi đã bỏ snapshot dùng block đó)"""
+    try:
+        shm.close()
+    except BufferError:
+        # Vẫn còn mảng tham chiếu tới block; vùng nhớ được giải phóng khi các mảng đó bị thu hồi
+        pass
+
+
+def close_all():
+    """Unlink mọi block còn lại khi service dừng"""
+    with _lock:
+        blocks: List[SharedCatalog] = list(_live.values())
+        for block in blocks:
+            block.retired = True
+            block.pending = 0
+            block._unlink_if_idle()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "blocks": len(_live),
+            "bytes": sum(block.nbytes for block in _live.values()),
+            "versions": sorted(_live),
+        }
@@ -0,0 +1,226 @@
+"""
+Chỉ mục ngược cho matcher: kỹ năng (đã chuẩn hóa) và từ khóa -> danh sách opportunity.
+
+Dùng để sinh ứng viên và tính cận trên điểm của từng opportunity; khi chỉ cần top-k,
+các opportunity có cận trên thấp hơn điểm thứ k hiện tại được bỏ qua, không phải chấm đầy đủ.
+"""
+import heapq
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import matcher
+from schemas import MatchResult, OpportunityInput, StudentProfile
+
+# Số từ khóa được nhớ danh sách opportunity chứa nó
+TERM_CACHE_SIZE = 4096
+
+# Ký tự phân tách các mô tả khi ghép thành một chuỗi để tìm kiếm
+_SEPARATOR = "\x00"
+
+
+class KeywordIndex:
+    """
+    Từ khóa -> các opportunity có mô tả (đã chuẩn hóa) chứa từ khóa đó, giữ nguyên ngữ nghĩa
+    substring của toán tử "in" trong matcher. Danh sách được tính lần đầu khi cần và nhớ theo LRU.
+    """
+
+    def __init__(self, descriptions: Sequence[str], cache_size: int = TERM_CACHE_SIZE):
+        self.descriptions = list(descriptions)
+        self.size = len(self.descriptions)
+        self.cache_size = cache_size
+        # Toàn bộ mô tả ghép thành một chuỗi để tìm bằng str.find (chạy trong C)
+        self._joined = _SEPARATOR.join(self.descriptions)
+        lengths = np.fromiter((len(d) + 1 for d in self.descriptions), dtype=np.int64, count=self.size)
+        self._starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def postings(self, term: str) -> np.ndarray:
+        """Chỉ số (tăng dần) của các opportunity chứa term."""
+        cached = self._cache.get(term)
+        if cached is not None:
+            self._cache.move_to_end(term)
+            return cached
+        if not term:
+            rows = np.arange(self.size, dtype=np.int64)  # "" luôn là substring
+        elif _SEPARATOR in term:
+            rows = np.asarray(
+                [row for row, description in enumerate(self.descriptions) if term in description],
+                dtype=np.int64,
+            )
+        else:
+            rows = self._find_all(term)
+        self._cache[term] = rows
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return rows
+
+    def _find_all(self, term: str) -> np.ndarray:
+        joined, starts = self._joined, self._starts
+        found: List[int] = []
+        position = joined.find(term)
+        while position != -1:
+            row = int(np.searchsorted(starts, position, side="right")) - 1
+            found.append(row)
+            # Đã khớp opportunity này, nhảy sang mô tả kế tiếp
+            if row + 1 >= self.size:
+                break
+            position = joined.find(term, int(starts[row + 1]))
+        return np.asarray(found, dtype=np.int64)
+
+    def hits(self, term: str) -> np.ndarray:
+        """Mảng bool theo opportunity: mô tả có chứa term."""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.postings(term)] = True
+        return mask
+
+    def count_hits(self, terms: Sequence[str]) -> np.ndarray:
+        """Số term (tính cả lặp lại) xuất hiện trong mô tả của từng opportunity."""
+        counts = np.zeros(self.size, dtype=np.float64)
+        for term in terms:
+            counts[self.postings(term)] += 1
+        return counts
+
+
+class InvertedIndex:
+    """Chỉ mục kỹ năng yêu cầu và từ khóa mô tả của một catalog."""
+
+    def __init__(self, opportunities: Sequence[OpportunityInput]):
+        self.opportunities = list(opportunities)
+        n = len(self.opportunities)
+        self.size = n
+        # has_skills: danh sách kỹ năng gốc khác rỗng; skill_count: số kỹ năng sau chuẩn hóa
+        self.has_skills = np.zeros(n, dtype=bool)
+        self.skill_count = np.zeros(n, dtype=np.float64)
+        postings: Dict[str, List[int]] = {}
+        descriptions = []
+        for row, opp in enumerate(self.opportunities):
+            required = opp.criteria.skills if opp.criteria else []
+            self.has_skills[row] = bool(required)
+            required_set = set(matcher._normalize_list(required))
+            self.skill_count[row] = len(required_set)
+            for skill in required_set:
+                postings.setdefault(skill, []).append(row)
+            descriptions.append(matcher._normalize_text(opp.description))
+        self.skill_postings: Dict[str, np.ndarray] = {
+            skill: np.asarray(rows, dtype=np.int64) for skill, rows in postings.items()
+        }
+        self.keywords = KeywordIndex(descriptions)
+
+    def skill_overlap(self, terms: set) -> np.ndarray:
+        """Số kỹ năng yêu cầu của mỗi opportunity nằm trong tập terms."""
+        overlap = np.zeros(self.size, dtype=np.float64)
+        for term in terms:
+            rows = self.skill_postings.get(term)
+            if rows is not None:
+                overlap[rows] += 1
+        return overlap
+
+    def upper_bounds(self, student: StudentProfile) -> np.ndarray:
+        """
+        Cận trên điểm tổng (chưa làm tròn) của từng opportunity. Kỹ năng, sở thích và điểm mạnh
+        tính chính xác từ chỉ mục; GPA lấy tối đa 1.0 và mục tiêu lấy mức cao nhất mà mục tiêu
+        của sinh viên có thể đạt. Opportunity không có kỹ năng/từ khóa chung với sinh viên
+        chỉ còn phần điểm cơ bản nên nằm cuối khi sắp theo cận trên.
+        """
+        n = self.size
+        weights = matcher.WEIGHTS
+
+        if not student.skills:
+            skills = np.where(self.has_skills, 0.0, 1.0)
+        else:
+            student_set = set(matcher._normalize_list(student.skills))
+            overlap = self.skill_overlap(student_set)
+            union = self.skill_count + len(student_set) - overlap
+            jaccard = np.divide(overlap, union, out=np.zeros(n), where=union > 0)
+            if not student_set:
+                jaccard = np.where(self.skill_count == 0, 1.0, 0.0)
+            skills = np.where(self.has_skills, jaccard, 1.0)
+
+        if not student.interests:
+            interests = np.full(n, 0.5)
+        else:
+            terms = [matcher._normalize_text(interest) for interest in student.interests]
+            interests = self.keywords.count_hits(terms) / len(student.interests)
+
+        if not student.strengths:
+            strengths = np.full(n, 0.5)
+        else:
+            strengths_set = set(matcher._normalize_list(student.strengths))
+            desc_score = self.keywords.count_hits(list(strengths_set))
+            if strengths_set:
+                desc_score = desc_score / len(strengths_set)
+            related = self.skill_overlap(strengths_set)
+            skill_score = np.divide(related, self.skill_count, out=np.zeros(n), where=self.skill_count > 0)
+            strengths = desc_score * 0.5 + skill_score * 0.5
+
+        if not student.goals:
+            goals = 0.5
+        else:
+            goals_lower = [g.lower() for g in student.goals]
+            goals = 0.0
+            if any("research" in g or "academic" in g for g in goals_lower):
+                goals += 0.5
+            if any("industry" in g or "job" in g or "career" in g for g in goals_lower):
+                goals += 0.5
+            goals = min(1.0, goals)
+
+        return (
+            1.0 * weights["gpa"] +
+            skills * weights["skills"] +
+            interests * weights["interests"] +
+            goals * weights["goals"] +
+            strengths * weights["strengths"]
+        )
+
+
+def build_index(snapshot) -> InvertedIndex:
+    """Builder cho CatalogSnapshot.derived()"""
+    return InvertedIndex(snapshot.opportunities)
+
+
+def match_top_k(student: StudentProfile, index: InvertedIndex, limit: int,
+                include_reasons: bool = True) -> List[MatchResult]:
+    """
+    Top-k của matcher.match_opportunities mà không chấm toàn bộ catalog: ứng viên có kỹ năng/từ khóa
+    chung được duyệt trước theo cận trên giảm dần, dừng khi cận trên thấp hơn điểm thứ k trong heap.
+    Cùng điểm thì ưu tiên opportunity đứng trước trong catalog (giống sort ổn định).
+    Lý do khớp chỉ được tạo cho k kết quả cuối cùng.
+    """
+    if limit <= 0 or not index.size:
+        return []
+    bounds = index.upper_bounds(student)
+    # Heap nhỏ nhất theo (điểm, -vị trí): phần tử đầu heap là kết quả "kém nhất" đang giữ
+    heap: List[tuple] = []
+    for row in np.argsort(-bounds, kind="stable").tolist():
+        if len(heap) >= limit and round(float(bounds[row]), 4) < heap[0][0]:
+            break
+        score, components = matcher.calculate_match_components(student, index.opportunities[row])
+        item = (score, -row, components)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    return [
+        matcher.build_result(student, index.opportunities[-negative_row], score, components, include_reasons)
+        for score, negative_row, components in sorted(heap, key=lambda item: (-item[0], -item[1]))
+    ]
+
+
+def top_k_indices(scores: np.ndarray, limit: Optional[int]) -> np.ndarray:
+    """
+    Chỉ số của limit phần tử điểm cao nhất theo thứ tự giảm dần, cùng điểm thì chỉ số nhỏ trước
+    (kết quả giống argsort ổn định rồi cắt). Dùng argpartition nên không phải sắp xếp cả mảng.
+    """
+    n = len(scores)
+    if limit is None or limit >= n:
+        return np.argsort(-scores, kind="stable")
+    if limit <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = np.partition(scores, n - limit)[n - limit]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[: limit - len(above)]
+    selected = np.concatenate((above, ties))
+    return selected[np.argsort(-scores[selected], kind="stable")]
@@ -0,0 +1,303 @@
+"""
+Kho hồ sơ sinh viên cho matching ngược (xếp hạng sinh viên cho một opportunity).
+
+Hồ sơ được đồng bộ từ user-service theo con trỏ (updated_at, user_id): mỗi lần làm mới chỉ lấy
+các hồ sơ thay đổi từ lần trước. Khi có thay đổi, toàn bộ sinh viên được biên dịch lại thành
+mảng NumPy (CompiledStudents) trong thread riêng rồi mới thay vào; điểm của một opportunity với
+mọi sinh viên được tính bằng vài phép toán mảng, cùng công thức với matcher.calculate_match_score.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import matcher
+from schemas import OpportunityInput, StudentProfile
+from skill_index import top_k_indices
+from vector_engine import round_scores
+
+# Chu kỳ đồng bộ hồ sơ từ user-service (giây)
+STUDENT_STORE_TTL_SECONDS = float(os.getenv("STUDENT_STORE_TTL_SECONDS", "60"))
+# Sau số lần đồng bộ tăng dần này thì tải lại toàn bộ (bắt các thay đổi lọt con trỏ, hồ sơ bị xóa)
+STUDENT_FULL_SYNC_EVERY = int(os.getenv("STUDENT_FULL_SYNC_EVERY", "60"))
+STUDENT_SYNC_PAGE_SIZE = 1000
+
+_RESEARCH_SET = frozenset(matcher.RESEARCH_KEYWORDS)
+_INDUSTRY_SET = frozenset(matcher.INDUSTRY_KEYWORDS)
+
+# fetch_page(updated_after, after_user_id, limit) -> trang hồ sơ dạng dict của user-service
+FetchPage = Callable[[Optional[str], int, int], Awaitable[dict]]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Chuỗi phân cách bởi dấu phẩy -> danh sách (giống /match/simple)"""
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def to_student_profile(data: dict) -> StudentProfile:
+    """Hồ sơ user-service -> StudentProfile của matcher (cùng cách gateway/bff gọi /match/simple)"""
+    return StudentProfile(
+        user_id=data["user_id"],
+        gpa=data.get("gpa"),
+        skills=_split(data.get("skills")),
+        interests=_split(data.get("research_interests")),
+    )
+
+
+class _TermMatrix:
+    """Cặp (sinh viên, từ khóa) dạng COO trên một từ điển từ khóa chung."""
+
+    def __init__(self, vocab: Dict[str, int]):
+        self.vocab = vocab
+        self.rows: List[int] = []
+        self.cols: List[int] = []
+
+    def add(self, row: int, terms):
+        for term in terms:
+            self.rows.append(row)
+            self.cols.append(self.vocab.setdefault(term, len(self.vocab)))
+
+    def freeze(self):
+        self.rows = np.asarray(self.rows, dtype=np.int64)
+        self.cols = np.asarray(self.cols, dtype=np.int64)
+
+    def counts(self, term_mask: np.ndarray, size: int) -> np.ndarray:
+        """Số cặp của mỗi sinh viên có từ khóa thuộc term_mask"""
+        if not len(self.rows):
+            return np.zeros(size, dtype=np.float64)
+        selected = self.rows[term_mask[self.cols]]
+        return np.bincount(selected, minlength=size).astype(np.float64)
+
+
+class CompiledStudents:
+    """Danh sách sinh viên đã biên dịch thành mảng NumPy để chấm với một opportunity."""
+
+    def __init__(self, students: Sequence[StudentProfile]):
+        self.students = list(students)
+        n = len(self.students)
+        self.size = n
+        self.vocab: Dict[str, int] = {}
+        self.gpa = np.zeros(n, dtype=np.float64)
+        # has_*: danh sách gốc khác rỗng (các hàm calculate_* kiểm tra "if not ...")
+        self.has_skills = np.zeros(n, dtype=bool)
+        self.has_interests = np.zeros(n, dtype=bool)
+        self.has_strengths = np.zeros(n, dtype=bool)
+        self.has_goals = np.zeros(n, dtype=bool)
+        self.skill_count = np.zeros(n, dtype=np.float64)
+        self.interest_count = np.zeros(n, dtype=np.float64)
+        self.strength_count = np.zeros(n, dtype=np.float64)
+        self.research_goal = np.zeros(n, dtype=bool)
+        self.industry_goal = np.zeros(n, dtype=bool)
+        self.skills = _TermMatrix(self.vocab)
+        # Sở thích giữ cả phần tử lặp lại, điểm mạnh là tập (giống matcher)
+        self.interests = _TermMatrix(self.vocab)
+        self.strengths = _TermMatrix(self.vocab)
+
+        for row, student in enumerate(self.students):
+            self.gpa[row] = student.gpa or 0.0
+            self.has_skills[row] = bool(student.skills)
+            skill_set = set(matcher._normalize_list(student.skills))
+            self.skill_count[row] = len(skill_set)
+            self.skills.add(row, skill_set)
+
+            self.has_interests[row] = bool(student.interests)
+            self.interest_count[row] = len(student.interests)
+            self.interests.add(row, [matcher._normalize_text(interest) for interest in student.interests])
+
+            self.has_strengths[row] = bool(student.strengths)
+            strength_set = set(matcher._normalize_list(student.strengths))
+            self.strength_count[row] = len(strength_set)
+            self.strengths.add(row, strength_set)
+
+            self.has_goals[row] = bool(student.goals)
+            goals_lower = [g.lower() for g in student.goals]
+            self.research_goal[row] = any("research" in g or "academic" in g for g in goals_lower)
+            self.industry_goal[row] = any("industry" in g or "job" in g or "career" in g for g in goals_lower)
+
+        self.terms = list(self.vocab)
+        for matrix in (self.skills, self.interests, self.strengths):
+            matrix.freeze()
+
+    def score(self, opportunity: OpportunityInput) -> Dict[str, np.ndarray]:
+        """Điểm thành phần và điểm tổng (chưa làm tròn) của opportunity với mọi sinh viên."""
+        n = self.size
+        criteria = opportunity.criteria
+        description = matcher.descriptions.get(opportunity.description)
+
+        if criteria and criteria.gpa_min:
+            gpa_min = criteria.gpa_min
+            gpa = np.where(self.gpa >= gpa_min, 1.0, np.maximum(0.3, self.gpa / gpa_min))
+        else:
+            gpa = np.ones(n)
+
+        required = criteria.skills if criteria else []
+        required_set = set(matcher._normalize_list(required))
+        in_required = np.fromiter((term in required_set for term in self.terms), dtype=bool, count=len(self.terms))
+        if not required:
+            skills = np.ones(n)
+        else:
+            overlap = self.skills.counts(in_required, n)
+            union = self.skill_count + len(required_set) - overlap
+            jaccard = np.divide(overlap, union, out=np.zeros(n), where=union > 0)
+            if not required_set:
+                jaccard = np.where(self.skill_count == 0, 1.0, 0.0)
+            else:
+                jaccard = np.where(self.skill_count == 0, 0.0, jaccard)
+            skills = np.where(self.has_skills, jaccard, 0.0)
+
+        # Từ khóa nào của từ điển xuất hiện (substring) trong mô tả
+        in_description = np.fromiter(
+            (term in description.text for term in self.terms), dtype=bool, count=len(self.terms)
+        )
+        matched = self.interests.counts(in_description, n)
+        interests = np.where(
+            self.has_interests,
+            np.divide(matched, self.interest_count, out=np.zeros(n), where=self.interest_count > 0),
+            0.5,
+        )
+
+        research_ok = opportunity.type == "research_lab" or description.has_any(_RESEARCH_SET)
+        industry_ok = opportunity.type == "program" or description.has_any(_INDUSTRY_SET)
+        goals = np.zeros(n)
+        if research_ok:
+            goals += np.where(self.research_goal, 0.5, 0.0)
+        if industry_ok:
+            goals += np.where(self.industry_goal, 0.5, 0.0)
+        goals = np.where(self.has_goals, np.minimum(1.0, goals), 0.5)
+
+        desc_match = self.strengths.counts(in_description, n)
+        desc_score = np.divide(desc_match, self.strength_count, out=np.zeros(n), where=self.strength_count > 0)
+        related = self.strengths.counts(in_required, n)
+        skill_score = related / len(required_set) if required_set else np.zeros(n)
+        strengths = np.where(self.has_strengths, (desc_score * 0.5) + (skill_score * 0.5), 0.5)
+
+        components = {"gpa": gpa, "skills": skills, "interests": interests, "goals": goals, "strengths": strengths}
+        weights = matcher.WEIGHTS
+        components["total"] = (
+            gpa * weights["gpa"] +
+            skills * weights["skills"] +
+            interests * weights["interests"] +
+            goals * weights["goals"] +
+            strengths * weights["strengths"]
+        )
+        return components
+
+    def rank(self, opportunity: OpportunityInput, limit: int, offset: int = 0) -> List[dict]:
+        """
+        Trang [offset, offset + limit) của danh sách sinh viên xếp theo điểm giảm dần.
+        Không kèm lý do khớp: lý do nêu GPA/kỹ năng của sinh viên, không trả cho provider.
+        """
+        if not self.size:
+            return []
+        scores = round_scores(self.score(opportunity)["total"])
+        order = top_k_indices(scores, offset + limit)[offset:]
+        return [
+            {"student_user_id": self.students[row].user_id, "score": float(scores[row])}
+            for row in order.tolist()
+        ]
+
+
+class StudentFeatureStore:
+    """
+    Cache trong tiến trình của hồ sơ sinh viên từ user-service, đồng bộ tăng dần ở nền.
+    Request luôn dùng bản CompiledStudents mới nhất; chỉ phải chờ khi kho còn trống.
+    """
+
+    def __init__(self, ttl: float = STUDENT_STORE_TTL_SECONDS):
+        self.ttl = ttl
+        self.profiles: Dict[int, StudentProfile] = {}
+        self.version = 0
+        self.compiled: Optional[CompiledStudents] = None
+        self._cursor: Tuple[Optional[str], int] = (None, 0)
+        self._fetch_page: Optional[FetchPage] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.sync_errors = 0
+        self.last_sync: Optional[float] = None
+        self.last_changed = 0
+        self.last_error: Optional[str] = None
+
+    def start(self, fetch_page: FetchPage):
+        self._fetch_page = fetch_page
+        self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get(self) -> CompiledStudents:
+        compiled = self.compiled
+        if compiled is not None:
+            return compiled
+        await self.refresh()
+        return self.compiled
+
+    async def refresh(self, full: bool = False) -> int:
+        """Lấy các hồ sơ thay đổi kể từ lần trước (full: tải lại toàn bộ). Trả về số hồ sơ thay đổi."""
+        async with self._lock:
+            if self.compiled is None or self.syncs % STUDENT_FULL_SYNC_EVERY == 0:
+                full = True
+            updated_after, after_user_id = (None, 0) if full else self._cursor
+            changed: Dict[int, StudentProfile] = {}
+            try:
+                while True:
+                    page = await self._fetch_page(updated_after, after_user_id, STUDENT_SYNC_PAGE_SIZE)
+                    items = page.get("items", [])
+                    for item in items:
+                        changed[item["user_id"]] = to_student_profile(item)
+                    if items:
+                        updated_after, after_user_id = items[-1]["updated_at"], items[-1]["user_id"]
+                    if len(items) < STUDENT_SYNC_PAGE_SIZE:
+                        break
+            except Exception as e:
+                self.sync_errors += 1
+                self.last_error = str(getattr(e, "detail", None) or e)
+                raise
+
+            if full:
+                count = len(changed) if changed != self.profiles else 0
+                profiles = changed
+            else:
+                count = sum(1 for user_id, profile in changed.items() if self.profiles.get(user_id) != profile)
+                profiles = {**self.profiles, **changed}
+            if count or self.compiled is None:
+                # Biên dịch trong thread riêng, xong mới thay để request đang chạy không bị ảnh hưởng
+                compiled = await asyncio.to_thread(CompiledStudents, list(profiles.values()))
+                self.profiles = profiles
+                self.compiled = compiled
+                self.version += 1
+            self._cursor = (updated_after, after_user_id)
+            self.syncs += 1
+            self.last_sync = time.time()
+            self.last_changed = count
+            self.last_error = None
+            return count
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Student store sync failed: {self.last_error or e}")
+            await asyncio.sleep(self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "students": len(self.profiles),
+            "age_seconds": round(time.time() - self.last_sync, 3) if self.last_sync else None,
+            "ttl_seconds": self.ttl,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "last_changed": self.last_changed,
+            "last_error": self.last_error,
+        }
+
+
+student_store = StudentFeatureStore()
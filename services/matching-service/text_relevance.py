@@ -0,0 +1,121 @@
+"""
+Độ liên quan văn bản BM25 giữa từ khóa của sinh viên và tiêu đề + mô tả opportunity.
+
+Thay cho so khớp substring ("ai" khớp cả "maintain"): văn bản được tách token theo từ,
+chỉ mục thưa (scipy.sparse) gồm trọng số BM25 của từng (opportunity, token) được dựng một lần
+cho mỗi version catalog; truy vấn của một sinh viên là một phép nhân ma trận thưa với vector.
+Điểm được chuẩn hóa về [0, 1] bằng tổng trọng số lớn nhất có thể của các token trong truy vấn.
+
+Bật bằng TEXT_RELEVANCE=bm25 (mặc định "substring" giữ cách chấm cũ).
+"""
+import os
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from schemas import OpportunityInput
+
+# "substring" (mặc định, giống matcher cũ) hoặc "bm25"
+TEXT_RELEVANCE = os.getenv("TEXT_RELEVANCE", "substring")
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class BM25Index:
+    """Ma trận thưa (opportunity x token) trọng số BM25 của một catalog."""
+
+    def __init__(self, opportunities: Sequence[OpportunityInput], k1: float = BM25_K1, b: float = BM25_B):
+        self.size = len(opportunities)
+        self.vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        lengths = np.zeros(self.size, dtype=np.float64)
+        for row, opp in enumerate(opportunities):
+            tokens = tokenize(opp.title) + tokenize(opp.description)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                rows.append(row)
+                cols.append(self.vocab.setdefault(token, len(self.vocab)))
+
+        shape = (self.size, len(self.vocab))
+        # Cộng dồn các cặp trùng -> tần suất token trong từng opportunity
+        tf = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=shape,
+        )
+        tf.sum_duplicates()
+        document_frequency = np.bincount(tf.indices, minlength=shape[1]).astype(np.float64)
+        idf = np.log1p((self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        average_length = lengths.mean() if self.size and lengths.mean() > 0 else 1.0
+        row_of_entry = np.repeat(np.arange(self.size), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * lengths[row_of_entry] / average_length)
+        weights = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+        self.matrix = sparse.csr_matrix((weights, tf.indices, tf.indptr), shape=shape)
+        # Trọng số lớn nhất của mỗi token trên toàn catalog, để chuẩn hóa điểm về [0, 1]
+        self.max_weight = self.matrix.max(axis=0).toarray().ravel() if shape[0] and shape[1] else np.zeros(shape[1])
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """(mảng NumPy, phần còn lại) để dựng lại chỉ mục bằng from_shared()"""
+        arrays = {
+            "data": self.matrix.data,
+            "indices": self.matrix.indices,
+            "indptr": self.matrix.indptr,
+            "max_weight": self.max_weight,
+        }
+        return arrays, {"size": self.size, "vocab": self.vocab, "shape": self.matrix.shape}
+
+    @classmethod
+    def from_shared(cls, arrays: Dict[str, np.ndarray], state: Dict[str, Any]) -> "BM25Index":
+        """Dựng lại chỉ mục từ kết quả export() mà không tính lại trọng số"""
+        index = cls.__new__(cls)
+        index.size = state["size"]
+        index.vocab = state["vocab"]
+        index.matrix = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]), shape=state["shape"], copy=False
+        )
+        index.max_weight = arrays["max_weight"]
+        return index
+
+    def query_vector(self, phrases: Sequence[str]) -> np.ndarray:
+        """Các cụm từ của sinh viên -> vector truy vấn (số lần mỗi token xuất hiện)"""
+        query = np.zeros(len(self.vocab), dtype=np.float64)
+        for phrase in phrases:
+            for token in tokenize(phrase):
+                column = self.vocab.get(token)
+                if column is not None:
+                    query[column] += 1
+        return query
+
+    def relevance(self, phrases: Sequence[str]) -> np.ndarray:
+        """Điểm liên quan [0, 1] của mỗi opportunity với các cụm từ (0 nếu không token nào có trong catalog)"""
+        query = self.query_vector(phrases)
+        best = float(query @ self.max_weight)
+        if best <= 0:
+            return np.zeros(self.size, dtype=np.float64)
+        return np.minimum(1.0, (self.matrix @ query) / best)
+
+    def interests_relevance(self, student) -> np.ndarray:
+        """
+        Sở thích của sinh viên với mọi opportunity. Mục tiêu được ghép vào truy vấn;
+        phần so khớp loại opportunity của mục tiêu vẫn do calculate_goals_match chấm.
+        """
+        return self.relevance(list(student.interests) + list(student.goals))
+
+    def strengths_relevance(self, student) -> np.ndarray:
+        """Mức điểm mạnh của sinh viên được đề cập trong tiêu đề/mô tả của mọi opportunity"""
+        return self.relevance(list(student.strengths))
+
+
+def build_index(snapshot) -> BM25Index:
+    """Builder cho CatalogSnapshot.derived()"""
+    return BM25Index(snapshot.opportunities)
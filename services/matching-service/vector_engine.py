@@ -0,0 +1,275 @@
+"""
+Bộ chấm điểm vector hóa bằng NumPy cho matcher.
+
+Catalog được biên dịch một lần thành các mảng (ngưỡng GPA, mã loại, chỉ mục kỹ năng
+dạng COO, ma trận từ khóa); điểm của một sinh viên với toàn bộ catalog được tính bằng
+vài phép toán mảng. Kết quả giống bộ chấm Python trong matcher.py (cùng công thức,
+cùng thứ tự phép tính).
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import matcher
+import text_relevance
+from schemas import MatchResult, OpportunityInput, StudentProfile
+from skill_index import KeywordIndex, top_k_indices
+
+TYPE_CODES = {"scholarship": 0, "research_lab": 1, "program": 2}
+
+# Các mảng của CompiledCatalog được chia sẻ với worker qua shared memory (xem shared_catalog.py)
+SHARED_ARRAYS = (
+    "gpa_min", "has_gpa", "has_skills", "skill_count", "skill_rows", "skill_cols",
+    "type_codes", "research_ok", "industry_ok",
+)
+
+
+def round_scores(values: np.ndarray, digits: int = 4) -> np.ndarray:
+    """
+    Làm tròn giống round() của Python. np.round nhân lên 10^digits nên có thể lệch ở
+    các giá trị sát nửa đơn vị; chỉ các phần tử đó được làm tròn lại bằng round().
+    """
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_half).tolist():
+        rounded[index] = round(float(values[index]), digits)
+    return rounded
+
+
+class CompiledCatalog:
+    """Catalog opportunities đã biên dịch thành mảng NumPy."""
+
+    def __init__(self, opportunities: Sequence[OpportunityInput], text_index=None):
+        self.opportunities = list(opportunities)
+        n = len(self.opportunities)
+        self.size = n
+        # BM25Index (text_relevance) nếu sở thích/điểm mạnh được chấm theo BM25 thay cho substring
+        self.text_index = text_index
+
+        # GPA: has_gpa giống điều kiện "criteria and criteria.gpa_min"
+        gpa_min = np.zeros(n, dtype=np.float64)
+        has_gpa = np.zeros(n, dtype=bool)
+        # Kỹ năng yêu cầu: has_skills là danh sách gốc khác rỗng, skill_count là số kỹ năng sau chuẩn hóa
+        has_skills = np.zeros(n, dtype=bool)
+        skill_count = np.zeros(n, dtype=np.float64)
+        self.skill_vocab: Dict[str, int] = {}
+        skill_rows: List[int] = []
+        skill_cols: List[int] = []
+        type_codes = np.full(n, -1, dtype=np.int8)
+        self.descriptions: List[str] = []
+
+        for row, opp in enumerate(self.opportunities):
+            criteria = opp.criteria
+            if criteria and criteria.gpa_min:
+                has_gpa[row] = True
+                gpa_min[row] = criteria.gpa_min
+            required = criteria.skills if criteria else []
+            has_skills[row] = bool(required)
+            required_set = set(matcher._normalize_list(required))
+            skill_count[row] = len(required_set)
+            for skill in required_set:
+                skill_rows.append(row)
+                skill_cols.append(self.skill_vocab.setdefault(skill, len(self.skill_vocab)))
+            type_codes[row] = TYPE_CODES.get(opp.type, -1)
+            self.descriptions.append(matcher._normalize_text(opp.description))
+
+        self.gpa_min = gpa_min
+        self.has_gpa = has_gpa
+        self.has_skills = has_skills
+        self.skill_count = skill_count
+        # Chỉ mục kỹ năng dạng COO: cặp (opportunity, kỹ năng) cho mỗi kỹ năng yêu cầu
+        self.skill_rows = np.asarray(skill_rows, dtype=np.int64)
+        self.skill_cols = np.asarray(skill_cols, dtype=np.int64)
+        self.type_codes = type_codes
+
+        # Chỉ mục ngược từ khóa -> opportunity trên mô tả đã chuẩn hóa
+        self.keywords = KeywordIndex(self.descriptions)
+
+        # Ma trận từ khóa mục tiêu: có từ khóa research/industry trong mô tả
+        research_hits = self._any_hits(matcher.RESEARCH_KEYWORDS)
+        industry_hits = self._any_hits(matcher.INDUSTRY_KEYWORDS)
+        self.research_ok = (type_codes == TYPE_CODES["research_lab"]) | research_hits
+        self.industry_ok = (type_codes == TYPE_CODES["program"]) | industry_hits
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Tách catalog đã biên dịch thành (mảng NumPy, phần còn lại) để dựng lại bằng from_shared()"""
+        arrays = {name: getattr(self, name) for name in SHARED_ARRAYS}
+        # Mô tả đã chuẩn hóa dạng UTF-8 nối liền + offset, không phải danh sách str
+        encoded = [description.encode() for description in self.descriptions]
+        arrays["description_offsets"] = np.concatenate(
+            ([0], np.cumsum([len(item) for item in encoded], dtype=np.int64))
+        ).astype(np.int64)
+        arrays["description_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        state: Dict[str, Any] = {"skill_vocab": self.skill_vocab}
+        if self.text_index is not None:
+            text_arrays, state["bm25"] = self.text_index.export()
+            arrays.update({f"bm25_{name}": array for name, array in text_arrays.items()})
+        return arrays, state
+
+    @classmethod
+    def from_shared(cls, opportunities: Sequence[OpportunityInput], arrays: Dict[str, np.ndarray],
+                    state: Dict[str, Any]) -> "CompiledCatalog":
+        """
+        Dựng lại catalog từ kết quả export() mà không biên dịch lại: các mảng được dùng trực tiếp
+        (ví dụ view vào shared memory), chỉ chỉ mục từ khóa được dựng từ mô tả đã chuẩn hóa.
+        opportunities có thể là Sequence lười (chỉ đọc phần tử khi tạo kết quả).
+        """
+        compiled = cls.__new__(cls)
+        compiled.opportunities = opportunities
+        compiled.size = len(opportunities)
+        compiled.skill_vocab = state["skill_vocab"]
+        data = arrays["description_data"].tobytes()
+        offsets = arrays["description_offsets"].tolist()
+        compiled.descriptions = [
+            data[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+        for name in SHARED_ARRAYS:
+            setattr(compiled, name, arrays[name])
+        compiled.keywords = KeywordIndex(compiled.descriptions)
+        compiled.text_index = None
+        if "bm25" in state:
+            text_arrays = {
+                name[len("bm25_"):]: array for name, array in arrays.items() if name.startswith("bm25_")
+            }
+            compiled.text_index = text_relevance.BM25Index.from_shared(text_arrays, state["bm25"])
+        return compiled
+
+    # --- Tìm từ khóa trong mô tả ---
+
+    def term_hits(self, term: str) -> np.ndarray:
+        """Mảng bool: term có xuất hiện (substring) trong mô tả đã chuẩn hóa của từng opportunity."""
+        return self.keywords.hits(term)
+
+    def _any_hits(self, terms: Sequence[str]) -> np.ndarray:
+        hits = np.zeros(self.size, dtype=bool)
+        for term in terms:
+            hits |= self.term_hits(term)
+        return hits
+
+    def _skill_overlap(self, terms: set) -> np.ndarray:
+        """Số kỹ năng yêu cầu của mỗi opportunity nằm trong tập terms."""
+        mask = np.zeros(len(self.skill_vocab), dtype=bool)
+        for term in terms:
+            col = self.skill_vocab.get(term)
+            if col is not None:
+                mask[col] = True
+        selected = self.skill_rows[mask[self.skill_cols]]
+        return np.bincount(selected, minlength=self.size).astype(np.float64)
+
+    # --- Các thành phần điểm (cùng công thức với matcher.calculate_*) ---
+
+    def gpa_scores(self, student: StudentProfile) -> np.ndarray:
+        gpa = student.gpa or 0.0
+        ratio = np.divide(gpa, self.gpa_min, out=np.ones(self.size), where=self.has_gpa)
+        partial = np.where(gpa >= self.gpa_min, 1.0, np.maximum(0.3, ratio))
+        return np.where(self.has_gpa, partial, 1.0)
+
+    def skills_scores(self, student: StudentProfile) -> np.ndarray:
+        if not student.skills:
+            return np.where(self.has_skills, 0.0, 1.0)
+        student_set = set(matcher._normalize_list(student.skills))
+        intersection = self._skill_overlap(student_set)
+        union = self.skill_count + len(student_set) - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros(self.size), where=union > 0)
+        # Trường hợp tập rỗng của _jaccard_similarity
+        if not student_set:
+            jaccard = np.where(self.skill_count == 0, 1.0, 0.0)
+        else:
+            jaccard = np.where(self.skill_count == 0, 0.0, jaccard)
+        return np.where(self.has_skills, jaccard, 1.0)
+
+    def interests_scores(self, student: StudentProfile) -> np.ndarray:
+        if not student.interests:
+            return np.full(self.size, 0.5)
+        if self.text_index is not None:
+            return self.text_index.interests_relevance(student)
+        matched = np.zeros(self.size, dtype=np.float64)
+        for interest in student.interests:
+            matched += self.term_hits(matcher._normalize_text(interest))
+        return matched / len(student.interests)
+
+    def goals_scores(self, student: StudentProfile) -> np.ndarray:
+        if not student.goals:
+            return np.full(self.size, 0.5)
+        goals_lower = [g.lower() for g in student.goals]
+        score = np.zeros(self.size, dtype=np.float64)
+        if any("research" in g or "academic" in g for g in goals_lower):
+            score += np.where(self.research_ok, 0.5, 0.0)
+        if any("industry" in g or "job" in g or "career" in g for g in goals_lower):
+            score += np.where(self.industry_ok, 0.5, 0.0)
+        return np.minimum(1.0, score)
+
+    def strengths_scores(self, student: StudentProfile) -> np.ndarray:
+        if not student.strengths:
+            return np.full(self.size, 0.5)
+        strengths_set = set(matcher._normalize_list(student.strengths))
+        if self.text_index is not None:
+            desc_score = self.text_index.strengths_relevance(student)
+        else:
+            description_match = np.zeros(self.size, dtype=np.float64)
+            for strength in strengths_set:
+                description_match += self.term_hits(strength)
+            desc_score = description_match / len(strengths_set) if strengths_set else description_match
+        related = self._skill_overlap(strengths_set)
+        skill_score = np.divide(related, self.skill_count, out=np.zeros(self.size), where=self.skill_count > 0)
+        return (desc_score * 0.5) + (skill_score * 0.5)
+
+    def score(self, student: StudentProfile) -> Dict[str, np.ndarray]:
+        """Điểm thành phần và điểm tổng (chưa làm tròn) của sinh viên với mọi opportunity."""
+        components = {
+            "gpa": self.gpa_scores(student),
+            "skills": self.skills_scores(student),
+            "interests": self.interests_scores(student),
+            "goals": self.goals_scores(student),
+            "strengths": self.strengths_scores(student),
+        }
+        weights = matcher.WEIGHTS
+        components["total"] = (
+            components["gpa"] * weights["gpa"] +
+            components["skills"] * weights["skills"] +
+            components["interests"] * weights["interests"] +
+            components["goals"] * weights["goals"] +
+            components["strengths"] * weights["strengths"]
+        )
+        return components
+
+    def match(self, student: StudentProfile, limit: Optional[int] = None,
+              include_reasons: bool = True) -> List[MatchResult]:
+        """
+        Tương đương matcher.match_opportunities: sắp xếp theo điểm giảm dần. Có limit thì chỉ
+        chọn top-k (không sắp xếp cả catalog); kết quả và lý do chỉ được tạo cho các opportunity trả về.
+        """
+        if not self.size:
+            return []
+        components = self.score(student)
+        scores = round_scores(components["total"])
+        # Cùng điểm thì giữ thứ tự trong catalog như list.sort ổn định
+        order = top_k_indices(scores, limit).tolist()
+        score_list = scores[order].tolist()
+        columns = None
+        if include_reasons:
+            columns = [components[name][order].tolist() for name in ("gpa", "skills", "interests", "goals", "strengths")]
+        return [
+            matcher.build_result(
+                student, self.opportunities[row], score_list[position],
+                tuple(column[position] for column in columns) if columns else None,
+                include_reasons
+            )
+            for position, row in enumerate(order)
+        ]
+
+
+def compile_snapshot(snapshot) -> CompiledCatalog:
+    """Builder cho CatalogSnapshot.derived()"""
+    text_index = None
+    if text_relevance.TEXT_RELEVANCE == "bm25":
+        text_index = snapshot.derived("bm25", text_relevance.build_index)
+    return CompiledCatalog(snapshot.opportunities, text_index)
+
+
+def match_opportunities(student: StudentProfile, snapshot, limit: Optional[int] = None,
+                        include_reasons: bool = True) -> List[MatchResult]:
+    """Chấm điểm bằng catalog đã biên dịch của snapshot (biên dịch một lần cho mỗi version)."""
+    compiled = snapshot.derived("vector_engine", compile_snapshot)
+    return compiled.match(student, limit, include_reasons)
@@ -0,0 +1,79 @@
+"""
+Deadline của request do gateway truyền xuống (X-Request-Deadline).
+
+Bản sao giống hệt services/application-service/deadline_utils.py và services/matching-service/deadline_utils.py:
+mỗi service được build với Docker context riêng (./services/<tên>) nên không import được module dùng chung.
+Sửa file này thì sửa cả hai bản còn lại.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+# Header do gateway gắn vào: thời điểm hết hạn của request (epoch, mili giây)
+DEADLINE_HEADER = "X-Request-Deadline"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def _parse_deadline(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value) / 1000.0
+    except ValueError:
+        return None
+
+
+async def deadline_middleware(request: Request, call_next):
+    """Đọc deadline từ header; request đã quá hạn thì trả 504 ngay, không xử lý."""
+    deadline = _parse_deadline(request.headers.get(DEADLINE_HEADER))
+    if deadline is not None and deadline <= time.time():
+        return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+    token = _deadline.set(deadline)
+    try:
+        return await call_next(request)
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Số giây còn lại trước deadline (None nếu request không có deadline)."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def timeout(default: float) -> float:
+    """Timeout cho lời gọi downstream: không vượt quá thời gian còn lại của request."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(0.001, min(default, left))
+
+
+def propagate_headers(headers: Optional[dict] = None) -> dict:
+    """Thêm header deadline khi gọi sang service khác."""
+    result = dict(headers or {})
+    deadline = _deadline.get()
+    if deadline is not None:
+        result[DEADLINE_HEADER] = str(int(deadline * 1000))
+    return result
+
+
+async def run_with_deadline(awaitable: Awaitable):
+    """
+    Chạy awaitable (ví dụ asyncio.gather của nhiều lời gọi downstream) trong thời gian còn lại.
+    Quá hạn thì hủy toàn bộ công việc đang chờ và trả 504.
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(0.001, left))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
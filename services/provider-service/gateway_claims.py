@@ -0,0 +1,30 @@
+import hmac
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import Header
+
+# Bí mật chung với gateway; không cấu hình thì không tin các header X-User-*
+GATEWAY_SHARED_SECRET = os.getenv("GATEWAY_SHARED_SECRET", "")
+
+
+def gateway_claims(
+    x_user_id: Optional[str] = Header(None),
+    x_user_role: Optional[str] = Header(None),
+    x_user_email: Optional[str] = Header(None),
+    x_gateway_secret: Optional[str] = Header(None),
+) -> Optional[Dict[str, Any]]:
+    """
+    Claims do gateway đã xác thực JWT gắn vào header (X-User-Id, X-User-Role, X-User-Email).
+    Trả về None nếu request không đi qua gateway (thiếu/sai X-Gateway-Secret),
+    khi đó service tự giải mã token như trước.
+    """
+    if not GATEWAY_SHARED_SECRET or not x_gateway_secret or not x_user_id:
+        return None
+    if not hmac.compare_digest(x_gateway_secret, GATEWAY_SHARED_SECRET):
+        return None
+    try:
+        user_id = int(x_user_id)
+    except ValueError:
+        return None
+    return {"user_id": user_id, "role": x_user_role, "sub": x_user_email}
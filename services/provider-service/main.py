@@ -3,6 +3,7 @@ from database import engine
 from routes import router as provider_router
 from sqlmodel import SQLModel 
 from sqlalchemy import text
+from deadline_utils import deadline_middleware
 
 app = FastAPI(
     title="EduMatch - Provider Service",
@@ -10,6 +11,9 @@ app = FastAPI(
     version="1.0"
 )
 
+# Deadline do gateway truyền xuống (X-Request-Deadline)
+app.middleware("http")(deadline_middleware)
+
 @app.on_event("startup")
 def on_startup():
     try:
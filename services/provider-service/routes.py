@@ -8,6 +8,8 @@ import models, schemas
 import httpx
 import os
 import asyncio
+import deadline_utils
+from gateway_claims import gateway_claims
 from jose import jwt, JWTError
 
 APPLICATION_SERVICE_URL = os.getenv("APPLICATION_SERVICE_URL", "http://application-service:8004")
@@ -51,7 +53,12 @@ def _to_model_approval(status_value: Optional[schemas.OpportunityApprovalStatus]
     raw = status_value.value if hasattr(status_value, "value") else status_value
     return models.OpportunityApprovalStatus(raw)
 
-def require_admin(authorization: Optional[str]) -> dict:
+def require_admin(authorization: Optional[str], claims: Optional[dict] = None) -> dict:
+    # Gateway đã xác thực token: dùng luôn claims, không giải mã lại
+    if claims is not None:
+        if claims.get("role") != "admin":
+            raise HTTPException(status_code=403, detail="Admin privileges required")
+        return claims
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
     token = authorization.split(" ", 1)[1]
@@ -106,7 +113,10 @@ async def get_unread_status_for_app(student_user_id: int, provider_user_id: int,
     Trả về True nếu có tin nhắn chưa đọc cho user_to_check.
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(
+            timeout=deadline_utils.timeout(5.0),
+            headers=deadline_utils.propagate_headers()
+        ) as client:
             convo_resp = await client.post(
                 f"{NOTIFICATION_SERVICE_URL}/api/conversations",
                 json={
@@ -201,9 +211,10 @@ def get_opportunities_by_provider(provider_user_id: int, session: Session = Depe
 def admin_list_opportunities(
     approval_status: Optional[schemas.OpportunityApprovalStatus] = None,
     authorization: Optional[str] = Header(None),
+    claims: Optional[dict] = Depends(gateway_claims),
     session: Session = Depends(get_session)
 ):
-    require_admin(authorization)
+    require_admin(authorization, claims)
     query = select(models.Opportunity)
     if approval_status:
         query = query.where(
@@ -251,9 +262,10 @@ def update_opportunity_approval(
     opp_id: int,
     approval_in: schemas.OpportunityApprovalUpdate,
     authorization: Optional[str] = Header(None),
+    claims: Optional[dict] = Depends(gateway_claims),
     session: Session = Depends(get_session)
 ):
-    require_admin(authorization)
+    require_admin(authorization, claims)
     db_opp = session.get(models.Opportunity, opp_id)
     if not db_opp:
         raise HTTPException(status_code=404, detail="Opportunity not found")
@@ -381,10 +393,15 @@ async def get_applications_by_provider(user_id: int):
     Lấy tất cả hồ sơ ứng tuyển mà một provider nhận được (gọi sang Application Service).
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(
+            timeout=deadline_utils.timeout(5.0),
+            headers=deadline_utils.propagate_headers()
+        ) as client:
             response = await client.get(f"{APPLICATION_SERVICE_URL}/api/applications/provider/{user_id}")
             response.raise_for_status()
             return response.json()
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Timeout calling Application Service")
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Error calling Application Service: {e}")
     except httpx.HTTPStatusError as e:
@@ -394,7 +411,10 @@ async def get_applications_by_provider(user_id: int):
 @router.get("/applications/provider/{user_id}/enriched")
 async def get_applications_by_provider_enriched(user_id: int):
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(
+            timeout=deadline_utils.timeout(5.0),
+            headers=deadline_utils.propagate_headers()
+        ) as client:
             response = await client.get(f"{APPLICATION_SERVICE_URL}/api/applications/provider/{user_id}")
             response.raise_for_status()
             applications = response.json() or []
@@ -416,10 +436,11 @@ async def get_applications_by_provider_enriched(user_id: int):
                     tasks.append((app, profile_coro, unread_coro_provider))
             
             
-            results = await asyncio.gather(*[
+            # Quá deadline của request thì hủy các lời gọi còn đang chờ
+            results = await deadline_utils.run_with_deadline(asyncio.gather(*[
                 asyncio.gather(task[1], task[2], return_exceptions=True) 
                 for task in tasks
-            ])
+            ]))
             
             enriched = []
             for i, result in enumerate(results):
@@ -440,6 +461,9 @@ async def get_applications_by_provider_enriched(user_id: int):
                 })
 
             return enriched
+    except httpx.TimeoutException:
+        # Hết deadline/timeout khi gọi service phía sau: 504 giống matching-service
+        raise HTTPException(status_code=504, detail="Timeout calling downstream services")
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Error calling downstream services: {e}")
     except httpx.HTTPStatusError as e:
@@ -459,7 +483,10 @@ async def update_application_status(
     Provider cập nhật trạng thái hồ sơ (gọi sang Application Service).
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(
+            timeout=deadline_utils.timeout(5.0),
+            headers=deadline_utils.propagate_headers()
+        ) as client:
             response = await client.patch(
                 f"{APPLICATION_SERVICE_URL}/api/applications/{app_id}/status",
                 json={"status": status_in.status.value}
@@ -478,6 +505,8 @@ async def update_application_status(
 
             return updated_app
 
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Timeout calling Application Service")
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Error calling Application Service: {e}")
     except httpx.HTTPStatusError as e:
@@ -1,7 +1,9 @@
 from jose import jwt, JWTError
-from fastapi import Header, HTTPException
+from fastapi import Depends, Header, HTTPException
 from typing import Optional, Dict, Any
 
+from gateway_claims import gateway_claims
+
 
 def decode_bearer_token(authorization: Optional[str]) -> Dict[str, Any]:
     if not authorization or not authorization.lower().startswith("bearer "):
@@ -14,3 +16,13 @@ def decode_bearer_token(authorization: Optional[str]) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+
+
+def get_token_claims(
+    authorization: Optional[str] = Header(None),
+    claims: Optional[Dict[str, Any]] = Depends(gateway_claims),
+) -> Dict[str, Any]:
+    """Claims của người dùng: lấy từ header gateway đã xác thực, nếu không có thì giải mã token."""
+    if claims is not None:
+        return claims
+    return decode_bearer_token(authorization)
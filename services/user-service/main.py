@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import SQLModel
 
 from database import engine
+from models import StudentProfile
 from routes import router
 
 
@@ -21,6 +22,9 @@ app.add_middleware(
 def on_startup():
     try:
         SQLModel.metadata.create_all(bind=engine)
+        # create_all không thêm index mới vào bảng đã tồn tại
+        for index in StudentProfile.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
     except Exception as e:
         print(f"DB init error: {e}")
 
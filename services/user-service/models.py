@@ -1,9 +1,13 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
 
 
 class StudentProfile(SQLModel, table=True):
+    # Con trỏ đồng bộ của matching-service lọc và sắp theo (updated_at, user_id)
+    __table_args__ = (Index("ix_studentprofile_updated_at_user_id", "updated_at", "user_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(index=True, unique=True)
     full_name: Optional[str] = None
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlmodel import Session, select
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select, or_, and_
+from typing import Any, Dict, Optional
 from datetime import datetime
 from models import StudentProfile, ProviderProfile
 from database import get_session
 from models import StudentProfile
 from schemas import StudentProfileRead, StudentProfileUpdate,ProviderProfileRead,ProviderProfileUpdate
-from auth_utils import decode_bearer_token
+from schemas import StudentMatchingProfile, StudentMatchingProfilePage
+from auth_utils import get_token_claims
+from gateway_claims import require_service_secret
 
 router = APIRouter(prefix="/api", tags=["User Service"])
 
@@ -30,8 +32,7 @@ def to_read_model(profile: StudentProfile) -> StudentProfileRead:
 
 
 @router.get("/student/profile", response_model=Optional[StudentProfileRead])
-def get_my_profile(authorization: Optional[str] = Header(None), session: Session = Depends(get_session)):
-    payload = decode_bearer_token(authorization)
+def get_my_profile(payload: Dict[str, Any] = Depends(get_token_claims), session: Session = Depends(get_session)):
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
@@ -44,10 +45,9 @@ def get_my_profile(authorization: Optional[str] = Header(None), session: Session
 @router.put("/student/profile", response_model=StudentProfileRead)
 def update_my_profile(
     data: StudentProfileUpdate,
-    authorization: Optional[str] = Header(None),
+    payload: Dict[str, Any] = Depends(get_token_claims),
     session: Session = Depends(get_session),
 ):
-    payload = decode_bearer_token(authorization)
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
@@ -78,6 +78,50 @@ def get_profile_by_user_id(user_id: int, session: Session = Depends(get_session)
     return to_read_model(profile)
 
 
+@router.get(
+    "/student/profiles",
+    response_model=StudentMatchingProfilePage,
+    dependencies=[Depends(require_service_secret)],
+)
+def list_matching_profiles(
+    updated_after: Optional[datetime] = None,
+    after_user_id: int = 0,
+    limit: int = Query(500, ge=1, le=5000),
+    session: Session = Depends(get_session),
+):
+    """
+    Danh sách hồ sơ sinh viên cho matching-service, sắp theo (updated_at, user_id).
+    Truyền lại con trỏ của trang trước để chỉ lấy các hồ sơ thay đổi sau lần đồng bộ gần nhất.
+    Chỉ dùng nội bộ: yêu cầu X-Service-Secret, gateway không chuyển tiếp route này.
+    """
+    statement = select(StudentProfile)
+    if updated_after is not None:
+        statement = statement.where(or_(
+            StudentProfile.updated_at > updated_after,
+            and_(StudentProfile.updated_at == updated_after, StudentProfile.user_id > after_user_id),
+        ))
+    statement = statement.order_by(StudentProfile.updated_at, StudentProfile.user_id).limit(limit)
+    profiles = session.exec(statement).all()
+
+    items = [
+        StudentMatchingProfile(
+            user_id=profile.user_id,
+            gpa=profile.gpa,
+            major=profile.major,
+            skills=profile.skills,
+            research_interests=profile.research_interests,
+            thesis_topic=profile.thesis_topic,
+            updated_at=profile.updated_at,
+        )
+        for profile in profiles
+    ]
+    page = StudentMatchingProfilePage(items=items)
+    if len(items) == limit:
+        page.next_updated_after = items[-1].updated_at
+        page.next_after_user_id = items[-1].user_id
+    return page
+
+
 #provider
 def to_provider_read_model(profile: ProviderProfile) -> ProviderProfileRead:
     return ProviderProfileRead(
@@ -91,8 +135,7 @@ def to_provider_read_model(profile: ProviderProfile) -> ProviderProfileRead:
     )
 
 @router.get("/provider/profile", response_model=Optional[ProviderProfileRead])
-def get_my_provider_profile(authorization: Optional[str] = Header(None), session: Session = Depends(get_session)):
-    payload = decode_bearer_token(authorization)
+def get_my_provider_profile(payload: Dict[str, Any] = Depends(get_token_claims), session: Session = Depends(get_session)):
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
@@ -105,10 +148,9 @@ def get_my_provider_profile(authorization: Optional[str] = Header(None), session
 @router.put("/provider/profile", response_model=ProviderProfileRead)
 def update_my_provider_profile(
     data: ProviderProfileUpdate,
-    authorization: Optional[str] = Header(None),
+    payload: Dict[str, Any] = Depends(get_token_claims),
     session: Session = Depends(get_session),
 ):
-    payload = decode_bearer_token(authorization)
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
@@ -1,5 +1,6 @@
 from sqlmodel import SQLModel
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
 
 
 class StudentProfileBase(SQLModel):
@@ -24,6 +25,24 @@ class StudentProfileRead(StudentProfileBase):
 class StudentProfileUpdate(StudentProfileBase):
     pass
 
+
+class StudentMatchingProfile(SQLModel):
+    """Các trường hồ sơ dùng cho matching (không gồm thông tin liên hệ)"""
+    user_id: int
+    gpa: Optional[float] = None
+    major: Optional[str] = None
+    skills: Optional[str] = None
+    research_interests: Optional[str] = None
+    thesis_topic: Optional[str] = None
+    updated_at: datetime
+
+
+class StudentMatchingProfilePage(SQLModel):
+    items: List[StudentMatchingProfile]
+    # Con trỏ cho trang kế tiếp (truyền lại vào updated_after/after_user_id); None khi đã hết
+    next_updated_after: Optional[datetime] = None
+    next_after_user_id: Optional[int] = None
+
 #provider
 class ProviderProfileBase(SQLModel):
     company_name: Optional[str] = None